@@ -18,6 +18,7 @@ class MessageList:
         self.current_account_data = None
         self.messages = []
         self.message_selected_callback = None
+        self.folder_synced_callback = None
         self.header = None
 
         self.widget = Adw.PreferencesGroup()
@@ -39,7 +40,8 @@ class MessageList:
         self.sync_handler = MessageSyncHandler(storage)
 
         self.loader.connect_callbacks(self.on_messages_loaded, self.on_messages_error)
-        self.sync_handler.connect_messages_loaded_callback(self.on_messages_loaded)
+        self.loader.connect_messages_appended(self.on_more_messages_loaded)
+        self.sync_handler.connect_folder_synced_callback(self.on_folder_synced)
 
         self.states.show_empty()
 
@@ -83,20 +85,23 @@ class MessageList:
 
         self.loader.load_messages(force_refresh)
 
-    def on_messages_loaded(self, messages):
+    def on_messages_loaded(self, messages, thread_records=()):
         logging.info(
             f"MessageList: Messages loaded successfully, count: {len(messages)}"
         )
+        previous_records = self.renderer.thread_records
+        self.renderer.set_thread_records(thread_records)
         
-        if self.messages and len(self.messages) == len(messages):
-            old_uids = {msg.get('uid') for msg in self.messages}
-            new_uids = {msg.get('uid') for msg in messages}
-            if old_uids == new_uids:
-                logging.debug("MessageList: Message UIDs unchanged, skipping re-render")
-                self.messages = messages  
-                if self.header:
-                    GLib.idle_add(self.header.set_loading, False)
-                return
+        if (
+            self.messages
+            and self._row_states(self.messages) == self._row_states(messages)
+            and self.renderer.thread_records == previous_records
+        ):
+            logging.debug("MessageList: Messages and their flags unchanged, skipping re-render")
+            self.messages = messages  
+            if self.header:
+                GLib.idle_add(self.header.set_loading, False)
+            return
         
         self.messages = messages
 
@@ -105,6 +110,34 @@ class MessageList:
 
         self.apply_search_filter()
 
+    @staticmethod
+    def _row_states(messages):
+        return [
+            (msg.get('uid'), msg.get('is_read'), msg.get('is_flagged'), msg.get('is_answered'))
+            for msg in messages
+        ]
+
+    def load_more_messages(self):
+        self.loader.load_more_messages()
+
+    def on_more_messages_loaded(self, messages, thread_records):
+        logging.debug(f"MessageList: Appending {len(messages)} messages")
+        self.renderer.add_thread_records(thread_records)
+        self.messages = self.messages + messages
+        self.apply_search_filter()
+
+    def on_folder_synced(self):
+        logging.debug("MessageList: Folder synced, refreshing loaded messages from storage")
+        if self.messages:
+            self.loader.refresh_loaded_messages(len(self.messages))
+        else:
+            self.load_messages()
+        if self.folder_synced_callback:
+            self.folder_synced_callback()
+
+    def connect_folder_synced(self, callback):
+        self.folder_synced_callback = callback
+
     def on_messages_error(self, error_message):
         logging.error(f"MessageList: Error loading messages: {error_message}")
         
@@ -3,6 +3,8 @@ import threading
 import logging
 from utils.mail import fetch_messages_from_folder
 
+PAGE_SIZE = 50
+
 class MessageLoader:
     def __init__(self, storage, imap_backend):
         self.storage = storage
@@ -11,13 +13,19 @@ class MessageLoader:
         self.current_folder = None
         self.current_account_data = None
         self.header = None
+        self.next_page_token = None
+        self.loading_more = False
+        self.queued_refresh_count = None
         
         self.messages_loaded_callback = None
         self.messages_error_callback = None
+        self.messages_appended_callback = None
 
     def set_folder(self, folder):
         self.current_folder = folder
         self.current_fetch_id += 1
+        self.next_page_token = None
+        self.queued_refresh_count = None
 
     def set_account_data(self, account_data):
         self.current_account_data = account_data
@@ -29,6 +37,15 @@ class MessageLoader:
         self.messages_loaded_callback = messages_loaded_callback
         self.messages_error_callback = messages_error_callback
 
+    def connect_messages_appended(self, callback):
+        self.messages_appended_callback = callback
+
+    def _load_thread_records(self, folder, account_id, messages):
+        thread_ids = {message.get("thread_id") for message in messages} - {None}
+        if not thread_ids:
+            return []
+        return self.storage.get_threads(folder, account_id, thread_ids)
+
     def load_messages(self, force_refresh=False):
         if not self.current_folder:
             logging.debug("MessageLoader: No current folder, cannot load messages")
@@ -40,6 +57,7 @@ class MessageLoader:
 
         self.current_fetch_id += 1
         fetch_id = self.current_fetch_id
+        self.next_page_token = None
 
         account_id = self.current_account_data["email"]
         logging.info(
@@ -52,8 +70,8 @@ class MessageLoader:
                     logging.debug(
                         f"MessageLoader: Fetching messages from storage for folder {self.current_folder}, account_id {account_id}"
                     )
-                    messages = self.storage.get_messages(
-                        self.current_folder, account_id
+                    messages, next_page_token = self.storage.get_message_page(
+                        self.current_folder, account_id, limit=PAGE_SIZE
                     )
                     logging.debug(
                         f"MessageLoader: Retrieved {len(messages)} messages from storage"
@@ -69,8 +87,10 @@ class MessageLoader:
                         return
                     else:
                         logging.info(f"MessageLoader: Using {len(messages)} messages from storage, skipping IMAP")
+                        thread_records = self._load_thread_records(self.current_folder, account_id, messages)
+                        GLib.idle_add(self._set_next_page_token, fetch_id, next_page_token)
                         if self.messages_loaded_callback:
-                            GLib.idle_add(self.messages_loaded_callback, messages)
+                            GLib.idle_add(self.messages_loaded_callback, messages, thread_records)
                         return
                 else:
                     logging.debug(
@@ -97,6 +117,127 @@ class MessageLoader:
         thread.daemon = True
         thread.start()
 
+    def _set_next_page_token(self, fetch_id, next_page_token):
+        if fetch_id == self.current_fetch_id:
+            self.next_page_token = next_page_token
+
+    def load_more_messages(self):
+        if not self.next_page_token or self.loading_more or not self.current_account_data:
+            return
+
+        self.loading_more = True
+        fetch_id = self.current_fetch_id
+        folder = self.current_folder
+        account_id = self.current_account_data["email"]
+        page_token = self.next_page_token
+        logging.debug(f"MessageLoader: Loading next page for folder {folder}, fetch_id={fetch_id}")
+
+        def fetch_page():
+            try:
+                messages, next_page_token = self.storage.get_message_page(
+                    folder, account_id, limit=PAGE_SIZE, page_token=page_token
+                )
+                thread_records = self._load_thread_records(folder, account_id, messages)
+                GLib.idle_add(self._on_page_loaded, fetch_id, messages, thread_records, next_page_token)
+            except Exception as e:
+                logging.error(f"MessageLoader: Error loading next page for folder {folder}: {e}")
+                GLib.idle_add(self._on_page_loaded, fetch_id, [], [], page_token)
+
+        thread = threading.Thread(target=fetch_page)
+        thread.daemon = True
+        thread.start()
+
+    def refresh_loaded_messages(self, loaded_count):
+        if not self.current_folder or not self.current_account_data:
+            return
+        if self.loading_more:
+            self.queued_refresh_count = loaded_count
+            return
+
+        fetch_id = self.current_fetch_id
+        folder = self.current_folder
+        account_id = self.current_account_data["email"]
+        page_token = self.next_page_token
+        logging.debug(f"MessageLoader: Refreshing {loaded_count} loaded messages for folder {folder}")
+
+        def fetch_loaded():
+            try:
+                if page_token:
+                    messages = self.storage.get_messages_through(folder, account_id, page_token)
+                    next_page_token = page_token
+                else:
+                    messages, next_page_token = self.storage.get_message_page(
+                        folder, account_id, limit=loaded_count + PAGE_SIZE
+                    )
+                thread_records = self._load_thread_records(folder, account_id, messages)
+                GLib.idle_add(
+                    self._on_loaded_refreshed,
+                    fetch_id,
+                    page_token,
+                    loaded_count,
+                    messages,
+                    thread_records,
+                    next_page_token,
+                )
+            except Exception as e:
+                logging.error(f"MessageLoader: Error refreshing messages for folder {folder}: {e}")
+
+        thread = threading.Thread(target=fetch_loaded)
+        thread.daemon = True
+        thread.start()
+
+    def _on_loaded_refreshed(self, fetch_id, page_token, loaded_count, messages, thread_records, next_page_token):
+        if fetch_id != self.current_fetch_id:
+            logging.debug(f"MessageLoader: Refresh {fetch_id} was cancelled, ignoring response")
+            return
+        if self.loading_more or self.next_page_token != page_token:
+            logging.debug("MessageLoader: Loaded range changed during refresh, refreshing again")
+            self.refresh_loaded_messages(loaded_count + PAGE_SIZE)
+            return
+
+        self.next_page_token = next_page_token
+        if self.messages_loaded_callback:
+            self.messages_loaded_callback(messages, thread_records)
+
+    def _on_page_loaded(self, fetch_id, messages, thread_records, next_page_token):
+        self.loading_more = False
+        if fetch_id != self.current_fetch_id:
+            logging.debug(f"MessageLoader: Page load {fetch_id} was cancelled, ignoring response")
+            return
+
+        self.next_page_token = next_page_token
+        logging.debug(f"MessageLoader: Loaded page of {len(messages)} messages")
+        if messages and self.messages_appended_callback:
+            self.messages_appended_callback(messages, thread_records)
+        if self.queued_refresh_count is not None:
+            loaded_count, self.queued_refresh_count = self.queued_refresh_count, None
+            self.refresh_loaded_messages(loaded_count + len(messages))
+
+    def _store_and_load_first_page(self, fetch_id, messages, folder, account_id):
+        def store_and_load():
+            try:
+                self.storage.store_messages(messages, folder, account_id)
+                logging.debug(f"MessageLoader: Stored {len(messages)} messages in database")
+                page, next_page_token = self.storage.get_message_page(folder, account_id, limit=PAGE_SIZE)
+                thread_records = self._load_thread_records(folder, account_id, page)
+                GLib.idle_add(self._on_first_page_loaded, fetch_id, page, thread_records, next_page_token)
+            except Exception as e:
+                logging.error(f"MessageLoader: Error storing messages: {e}")
+                if self.messages_error_callback:
+                    GLib.idle_add(self.messages_error_callback, str(e))
+
+        thread = threading.Thread(target=store_and_load)
+        thread.daemon = True
+        thread.start()
+
+    def _on_first_page_loaded(self, fetch_id, messages, thread_records, next_page_token):
+        if fetch_id != self.current_fetch_id:
+            logging.debug(f"MessageLoader: First page load {fetch_id} was cancelled, ignoring response")
+            return
+        self.next_page_token = next_page_token
+        if self.messages_loaded_callback:
+            self.messages_loaded_callback(messages, thread_records)
+
     def _fetch_from_imap(self, fetch_id):
         if not self.current_account_data:
             logging.error("MessageLoader: No account_data available for IMAP fetch")
@@ -105,6 +246,7 @@ class MessageLoader:
             return
 
         account_data = self.current_account_data
+        folder = self.current_folder
 
         logging.debug(
             f"MessageLoader: Fetching messages from IMAP for folder {self.current_folder}, fetch_id={fetch_id}"
@@ -124,18 +266,7 @@ class MessageLoader:
                 logging.debug(
                     f"MessageLoader: Received {len(messages)} messages from IMAP"
                 )
-                try:
-                    self.storage.store_messages(
-                        messages, self.current_folder, account_data["email"]
-                    )
-                    logging.debug(
-                        f"MessageLoader: Stored {len(messages)} messages in database"
-                    )
-                except Exception as e:
-                    logging.error(f"MessageLoader: Error storing messages: {e}")
-
-                if self.messages_loaded_callback:
-                    GLib.idle_add(self.messages_loaded_callback, messages)
+                self._store_and_load_first_page(fetch_id, messages, folder, account_data["email"])
             else:
                 logging.debug("MessageLoader: No messages received from IMAP")
                 if self.messages_loaded_callback:
@@ -199,7 +199,9 @@ class MessageRow:
             return 1 if self.message_or_thread.has_attachments else 0
         elif isinstance(self.message_or_thread, dict):
             attachments = self.message_or_thread.get("attachments", [])
-            return len(attachments)
+            if attachments:
+                return len(attachments)
+            return 1 if self.message_or_thread.get("has_attachments", False) else 0
         else:
             return self.message_or_thread.get_attachment_count()
 
@@ -274,10 +276,35 @@ class MessageRow:
     def toggle_flag(self):
         if not self.is_thread:
             if isinstance(self.message_or_thread, dict):
-                self.message_or_thread["is_flagged"] = not self.message_or_thread.get("is_flagged", False)
+                flagged = not self.message_or_thread.get("is_flagged", False)
+                self.message_or_thread["is_flagged"] = flagged
+
+                if self.storage and self.current_account_data:
+                    uid = self.message_or_thread.get("uid")
+                    folder = self.message_or_thread.get("folder")
+                    account_id = self.current_account_data.get("email")
+
+                    if uid and folder and account_id:
+                        from utils.mail import set_message_flag_on_imap
+                        def on_imap_update(error, result):
+                            if error:
+                                logging.error(f"MessageRow: IMAP flag update failed, reverting: {error}")
+                                if self.message_or_thread.get("is_flagged") == flagged:
+                                    self.message_or_thread["is_flagged"] = not flagged
+                                    self.update_flag_indicator()
+                                return
+                            self.storage.update_message_flags(uid, folder, account_id, is_flagged=flagged)
+
+                        set_message_flag_on_imap(
+                            self.current_account_data, folder, uid, "\\Flagged", flagged, on_imap_update
+                        )
             else:
                 self.message_or_thread.is_flagged = not self.message_or_thread.is_flagged
 
+            self.update_flag_indicator()
+
+    def update_flag_indicator(self):
+        if not self.is_thread:
             if self.get_is_flagged():
                 if not hasattr(self, "flag_indicator"):
                     self.flag_indicator = self.create_flag_indicator()
@@ -1,5 +1,5 @@
 from utils.toolkit import Gtk
-from utils.thread_grouping import group_messages_into_threads
+from utils.thread_grouping import group_messages_into_threads, build_threads_from_records
 from .message_row import MessageRow
 import logging
 
@@ -11,11 +11,18 @@ class MessageRenderer:
         self._restoring_selection = False
         self.storage = None
         self.current_account_data = None
+        self.thread_records = {}
 
     def set_storage_and_account(self, storage, account_data):
         self.storage = storage
         self.current_account_data = account_data
 
+    def set_thread_records(self, thread_records):
+        self.thread_records = {record["id"]: record for record in thread_records}
+
+    def add_thread_records(self, thread_records):
+        self.thread_records.update((record["id"], record) for record in thread_records)
+
     def clear_list(self):
         self.message_row_instances.clear()
         while True:
@@ -48,7 +55,7 @@ class MessageRenderer:
 
         if grouped and self.threading_enabled:
             logging.debug("MessageRenderer: Grouping messages into threads")
-            threads = group_messages_into_threads(messages)
+            threads = self._build_threads(messages)
             logging.debug(f"MessageRenderer: Created {len(threads)} threads")
             
             for i, thread in enumerate(threads):
@@ -88,6 +95,20 @@ class MessageRenderer:
 
         logging.debug("MessageRenderer: Message list rendering complete")
 
+    def _build_threads(self, messages):
+        thread_ids = {
+            message.get("thread_id") if isinstance(message, dict) else None
+            for message in messages
+        }
+        if thread_ids and thread_ids <= self.thread_records.keys():
+            records = sorted(
+                (self.thread_records[thread_id] for thread_id in thread_ids),
+                key=lambda record: (record["latest_epoch"] or 0, record["id"]),
+                reverse=True,
+            )
+            return build_threads_from_records(records, messages)
+        return group_messages_into_threads(messages)
+
     def get_selected_message(self):
         selected_row = self.list_box.get_selected_row()
         if selected_row:
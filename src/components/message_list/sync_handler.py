@@ -12,7 +12,7 @@ class MessageSyncHandler:
         self.sync_service.add_sync_callback(self.on_sync_event)
         self.sync_service.start()
         
-        self.messages_loaded_callback = None
+        self.folder_synced_callback = None
 
     def set_folder(self, folder):
         self.current_folder = folder
@@ -28,8 +28,8 @@ class MessageSyncHandler:
         if account_data:
             self.sync_service.register_account(account_data)
 
-    def connect_messages_loaded_callback(self, callback):
-        self.messages_loaded_callback = callback
+    def connect_folder_synced_callback(self, callback):
+        self.folder_synced_callback = callback
 
     def sync_folder_manually(self, folder_name: str):
         if not self.current_account_data:
@@ -59,14 +59,8 @@ class MessageSyncHandler:
                 logging.info(
                     f"MessageSyncHandler: Sync completed for {folder_name}, {data} messages"
                 )
-                try:
-                    messages = self.storage.get_messages(folder_name, account_id)
-                    if self.messages_loaded_callback:
-                        GLib.idle_add(self.messages_loaded_callback, messages)
-                except Exception as e:
-                    logging.error(
-                        f"MessageSyncHandler: Error reloading messages after sync: {e}"
-                    )
+                if self.folder_synced_callback:
+                    GLib.idle_add(self.folder_synced_callback)
         elif event_type == "sync_error":
             if (
                 self.current_account_data and 
@@ -384,7 +384,8 @@ class MessageViewer:
             self.current_account_data, 
             message["folder"], 
             message["uid"], 
-            on_body_fetched
+            on_body_fetched,
+            storage=self.storage
         )
 
     def fetch_message_body_smart(self, message, thread=None):
@@ -513,7 +514,8 @@ class MessageViewer:
             self.current_account_data, 
             message["folder"], 
             message["uid"], 
-            on_body_fetched
+            on_body_fetched,
+            storage=self.storage
         )
 
     def display_message(self, message):
@@ -542,12 +544,14 @@ class MessageViewer:
                 message["is_read"] = True
                 
                 try:
-                    self.storage.update_message_read_status(uid, folder, account_id, True)
-                    logging.debug(f"MessageViewer: Updated read status in database for UID {uid}")
+                    future = self.storage.update_message_read_status(uid, folder, account_id, True)
+                    logging.debug(f"MessageViewer: Queued read status update in database for UID {uid}")
                     
                     # Notify message list that read status changed
                     if self.on_read_status_changed:
-                        self.on_read_status_changed(message)
+                        future.add_done_callback(
+                            lambda _: GLib.idle_add(self.on_read_status_changed, message)
+                        )
                     
                     from utils.mail import mark_message_as_read_on_imap
                     def on_imap_update(error, result):
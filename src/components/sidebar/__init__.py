@@ -38,6 +38,7 @@ class AccountsSidebar:
         self.selected_folder_button = None
         self.selection_callback = None
         self.loading_accounts = set()
+        self.folder_stats = {}
 
         self.load_accounts()
 
@@ -46,6 +47,41 @@ class AccountsSidebar:
         self.selection_callback = callback
         
 
+    def create_unread_badge(self):
+        badge = AppText(
+            expandable=False,
+            halign=Gtk.Align.END,
+            class_names="folder-unread-badge",
+        )
+        badge.widget.set_visible(False)
+        return badge
+
+    def update_unread_badge(self, badge, unread_count):
+        badge.set_text_content(str(unread_count))
+        badge.widget.set_visible(unread_count > 0)
+
+    def get_folder_unread_count(self, account_email, folder_path):
+        return self.folder_stats.get(account_email, {}).get(folder_path, {}).get("unread", 0)
+
+    def set_folder_stats(self, account_email, folder_stats):
+        """Update unread badges of an account's rows from storage folder stats"""
+        self.folder_stats[account_email] = folder_stats
+        for row in self.get_sidebar_rows():
+            badge = getattr(row, "unread_badge", None)
+            if badge is None:
+                continue
+            if hasattr(row, "account_data") and row.account_data["email"] == account_email:
+                self.update_unread_badge(
+                    badge, self.get_folder_unread_count(account_email, "INBOX")
+                )
+            elif (
+                hasattr(row, "parent_account")
+                and row.parent_account["email"] == account_email
+            ):
+                self.update_unread_badge(
+                    badge, self.get_folder_unread_count(account_email, row.full_path)
+                )
+
     def get_folder_icon(self, folder_name):
         folder_upper = folder_name.upper()
 
@@ -276,6 +312,11 @@ class AccountsSidebar:
                 folder_text = AppText(folder_data["name"], class_names="folder-text")
 
                 account_key = account_row.account_data["email"]
+                unread_badge = self.create_unread_badge()
+                self.update_unread_badge(
+                    unread_badge,
+                    self.get_folder_unread_count(account_key, folder_data["full_path"]),
+                )
                 folder_key = f"{account_key}:{folder_data['full_path']}"
                 is_expanded = self.expanded_folders.get(folder_key, False)
                 has_children = bool(folder_data.get("children"))
@@ -287,13 +328,13 @@ class AccountsSidebar:
                     )
                     folder_box = ContentContainer(
                         class_names="folder-content",
-                        children=[arrow_icon.widget, folder_text.widget],
+                        children=[arrow_icon.widget, folder_text.widget, unread_badge.widget],
                     )
                 else:
                     folder_icon = AppIcon(icon_name, class_names="folder-icon")
                     folder_box = ContentContainer(
                         class_names="folder-content",
-                        children=[folder_icon.widget, folder_text.widget],
+                        children=[folder_icon.widget, folder_text.widget, unread_badge.widget],
                     )
 
                 folder_button = AppButton(
@@ -326,6 +367,7 @@ class AccountsSidebar:
                 setattr(folder_row.widget, "folder_button", folder_button)
                 setattr(folder_row.widget, "parent_account", account_row.account_data)
                 setattr(folder_row.widget, "full_path", folder_data["full_path"])
+                setattr(folder_row.widget, "unread_badge", unread_badge)
                 setattr(folder_row.widget, "level", level)
                 setattr(folder_row.widget, "has_children", has_children)
                 setattr(
@@ -524,6 +566,7 @@ class AccountsSidebar:
                         account_icon = AppIcon(
                             "mail-unread-symbolic", class_names="account-icon"
                         )
+                        unread_badge = self.create_unread_badge()
                         account_box = ContentContainer(
                             spacing=6,
                             class_names="account-content",
@@ -533,6 +576,7 @@ class AccountsSidebar:
                                     text=account_data["account_name"],
                                     class_names=["account-text"],
                                 ).widget,
+                                unread_badge.widget,
                             ],
                         )
 
@@ -572,6 +616,7 @@ class AccountsSidebar:
                         setattr(account_row.widget, "expand_button", expand_button)
                         setattr(account_row.widget, "account_button", account_button)
                         setattr(account_row.widget, "account_data", account_data)
+                        setattr(account_row.widget, "unread_badge", unread_badge)
 
                         account_row.widget.set_selectable(True)
 
@@ -272,6 +272,9 @@ class AppScrolledWindow:
     def set_hexpand(self, expand):
         self.widget.set_hexpand(expand)
 
+    def connect_edge_reached(self, callback):
+        self.widget.connect("edge-reached", callback)
+
 class AppLabel:
     def __init__(self, text="", class_names=None):
         self.widget = Gtk.Label(label=text)
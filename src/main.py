@@ -1,9 +1,17 @@
 import atexit
+import sys
 from app import MyApp
 from utils.mail import cleanup_all_connections
+from utils.storage import EmailStorage
 
 
 if __name__ == "__main__":
+    if "--compact-database" in sys.argv[1:]:
+        storage = EmailStorage()
+        storage.enable_incremental_vacuum()
+        storage.close()
+        sys.exit(0)
+
     atexit.register(cleanup_all_connections)
 
     app = MyApp()
@@ -11,6 +19,8 @@ if __name__ == "__main__":
     def cleanup_on_exit():
         if hasattr(app, "window") and hasattr(app.window, "message_list"):
             app.window.message_list.cleanup()
+        if hasattr(app, "window") and hasattr(app.window, "storage"):
+            app.window.storage.close()
 
     atexit.register(cleanup_on_exit)
     app.run(None)
@@ -15,6 +15,24 @@ class MessageThread:
         self.has_attachments = False
         self.is_flagged = False
 
+    @classmethod
+    def from_record(
+        cls, record: Dict[str, Any], messages: List[Union[Message, Dict[str, Any]]]
+    ) -> "MessageThread":
+        """Build a thread from a materialized thread row and its loaded messages"""
+        thread = cls(record["subject"])
+        thread.thread_id = record["id"]
+        thread.messages = sorted(messages, key=thread._get_date_for_sort)
+        thread.participants = dict(record.get("participants") or {})
+        thread.unread_count = record.get("unread_count", 0)
+        thread.has_attachments = record.get("has_attachments", False)
+        thread.is_flagged = record.get("is_flagged", False)
+        if record.get("latest_epoch"):
+            thread.latest_date = datetime.fromtimestamp(record["latest_epoch"])
+        if record.get("earliest_epoch"):
+            thread.earliest_date = datetime.fromtimestamp(record["earliest_epoch"])
+        return thread
+
     def add_message(self, message: Union[Message, Dict[str, Any]]):
         """Add a message to the thread and update thread metadata"""
         self.messages.append(message)
@@ -0,0 +1,114 @@
+import json
+import sqlite3
+from email.utils import getaddresses
+from typing import Dict, Iterable, List, Tuple
+
+AddressEntry = Tuple[str, str, str]
+
+ADDRESS_ROLES = (("to", "recipients"), ("cc", "cc"), ("bcc", "bcc"), ("reply_to", "reply_to"))
+
+def parse_address_entries(value) -> List[Tuple[str, str]]:
+    """Parse a stored address list of dicts, header strings or JSON text into (email, name) pairs"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith("["):
+            try:
+                return parse_address_entries(json.loads(stripped))
+            except ValueError:
+                pass
+        value = [value]
+    if isinstance(value, dict):
+        value = [value]
+
+    pairs = []
+    for item in value:
+        if isinstance(item, dict):
+            candidates = [(item.get("name") or "", item.get("email") or "")]
+        elif isinstance(item, str):
+            candidates = getaddresses([item])
+        else:
+            continue
+        for name, address in candidates:
+            address = (address or "").strip().lower()
+            if "@" in address:
+                pairs.append((address, (name or "").strip()))
+    return pairs
+
+def _get_field(message, key):
+    if isinstance(message, dict):
+        return message.get(key)
+    return getattr(message, key, None)
+
+def extract_message_addresses(message) -> List[AddressEntry]:
+    """Get the (role, email, name) entries of a message dict or Message object"""
+    entries = []
+    seen = set()
+    sender = _get_field(message, "sender") or {}
+    roles = [("from", [sender] if isinstance(sender, dict) else sender)]
+    roles.extend((role, _get_field(message, field)) for role, field in ADDRESS_ROLES)
+    for role, value in roles:
+        for address, name in parse_address_entries(value):
+            if (role, address) not in seen:
+                seen.add((role, address))
+                entries.append((role, address, name))
+    return entries
+
+def index_message_addresses(
+    conn: sqlite3.Connection, account_id: str, folder: str, entries: Dict[int, Iterable[AddressEntry]]
+) -> int:
+    """Replace the address links of a batch of messages with set-based statements"""
+    if not entries:
+        return 0
+
+    conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS pending_addresses (
+            uid INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            email TEXT NOT NULL,
+            name TEXT
+        )
+    """
+    )
+    conn.execute("DELETE FROM pending_addresses")
+    conn.executemany(
+        "INSERT INTO pending_addresses (uid, role, email, name) VALUES (?, ?, ?, ?)",
+        [
+            (uid, role, address, name)
+            for uid, message_entries in entries.items()
+            for role, address, name in message_entries
+        ],
+    )
+    conn.execute(
+        """
+        INSERT INTO addresses (email, name)
+        SELECT email, MAX(name) FROM pending_addresses
+        WHERE true
+        GROUP BY email
+        ON CONFLICT(email) DO UPDATE SET name = COALESCE(NULLIF(addresses.name, ''), excluded.name)
+    """
+    )
+    conn.execute(
+        """
+        DELETE FROM message_addresses
+        WHERE message_id IN (
+            SELECT id FROM messages
+            WHERE account_id = ? AND folder = ? AND uid IN (SELECT value FROM json_each(?))
+        )
+    """,
+        (account_id, folder, json.dumps(list(entries))),
+    )
+    linked = conn.execute(
+        """
+        INSERT OR IGNORE INTO message_addresses (message_id, address_id, role)
+        SELECT messages.id, addresses.id, pending_addresses.role
+        FROM pending_addresses
+        JOIN messages ON messages.account_id = ? AND messages.folder = ? AND messages.uid = pending_addresses.uid
+        JOIN addresses ON addresses.email = pending_addresses.email
+    """,
+        (account_id, folder),
+    ).rowcount
+    conn.execute("DELETE FROM pending_addresses")
+    return linked
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+class RawMessageStore:
+    """Content addressed on-disk store for raw RFC822 messages"""
+
+    PRUNE_GRACE_SECONDS = 3600
+
+    def __init__(self, root: Path, prune_grace_seconds: float = PRUNE_GRACE_SECONDS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.prune_grace_seconds = prune_grace_seconds
+
+    @staticmethod
+    def digest(raw: bytes) -> str:
+        """Get the content address of a raw message"""
+        return hashlib.sha256(raw).hexdigest()
+
+    def path_for(self, digest: str) -> Path:
+        """Get the file path of a stored message"""
+        return self.root / digest[:2] / digest
+
+    def put(self, raw: bytes) -> str:
+        """Store a raw message once and return its digest"""
+        digest = self.digest(raw)
+        path = self.path_for(digest)
+        if path.is_file():
+            os.utime(path)
+            logging.debug(f"RawMessageStore: {digest} already stored")
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(raw)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        logging.debug(f"RawMessageStore: Stored {digest} ({len(raw)} bytes)")
+        return digest
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """Read a stored message, None when it is missing"""
+        try:
+            return self.path_for(digest).read_bytes() if digest else None
+        except FileNotFoundError:
+            return None
+
+    def prune(self, live_digests: Iterable[str]) -> int:
+        """Delete unreferenced stored messages older than the grace period, sparing ones whose row is not committed yet"""
+        live = set(live_digests)
+        cutoff = time.time() - self.prune_grace_seconds
+        removed = 0
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-") or path.name in live:
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                path.unlink()
+                removed += 1
+            except OSError as e:
+                logging.warning(f"RawMessageStore: Could not remove {path}: {e}")
+        logging.debug(f"RawMessageStore: Pruned {removed} unreferenced messages")
+        return removed
@@ -0,0 +1,18 @@
+import zlib
+from typing import Optional
+
+COMPRESSION_LEVEL = 6
+
+def compress_body(body: Optional[str]) -> Optional[bytes]:
+    """Compress a message body for storage, None when there is nothing to keep"""
+    if not body:
+        return None
+    return zlib.compress(str(body).encode("utf-8"), COMPRESSION_LEVEL)
+
+def decompress_body(blob) -> str:
+    """Restore a message body stored by compress_body"""
+    if not blob:
+        return ""
+    if isinstance(blob, str):
+        return blob
+    return zlib.decompress(blob).decode("utf-8")
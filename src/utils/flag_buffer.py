@@ -0,0 +1,113 @@
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+FlagKey = Tuple[str, str, int]
+
+class FlagBuffer:
+    """Collects read, flagged and answered changes and writes each batch in one job"""
+
+    FIELDS = ("is_read", "is_flagged", "is_answered")
+    FLUSH_DELAY_SECONDS = 0.5
+
+    def __init__(self, submit: Callable[[Callable], Future], delay: float = FLUSH_DELAY_SECONDS):
+        self._submit = submit
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending: Dict[FlagKey, Dict[str, bool]] = {}
+        self._in_flight: List[Dict[FlagKey, Dict[str, bool]]] = []
+        self._batch_future: Optional[Future] = None
+        self._timer: Optional[threading.Timer] = None
+
+    @staticmethod
+    def key(account_id: str, folder: str, uid: int) -> FlagKey:
+        """Get the buffer key of a message"""
+        return (account_id, folder, int(uid))
+
+    def update(self, key: FlagKey, changes: Dict[str, bool]) -> Future:
+        """Buffer flag changes of a message and get a future resolved once they are committed"""
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"FlagBuffer: Unsupported fields {sorted(unknown)}")
+
+        with self._lock:
+            self._pending.setdefault(key, {}).update(
+                {field: bool(value) for field, value in changes.items()}
+            )
+            if self._batch_future is None:
+                self._batch_future = Future()
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return self._batch_future
+
+    def pending_changes(self, key: FlagKey) -> Optional[Dict[str, bool]]:
+        """Get the not yet committed changes of a message, newest last"""
+        with self._lock:
+            if not self._pending and not self._in_flight:
+                return None
+            merged = {}
+            for batch in self._in_flight:
+                merged.update(batch.get(key, {}))
+            merged.update(self._pending.get(key, {}))
+            return merged or None
+
+    def apply(self, key: FlagKey, record: Dict) -> Dict:
+        """Overlay buffered changes on a message record read from the database"""
+        changes = self.pending_changes(key)
+        if changes:
+            record.update(changes)
+        return record
+
+    def flush(self) -> Optional[Future]:
+        """Write every buffered change in one job and return the batch future"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, {}
+            batch_future, self._batch_future = self._batch_future, None
+            if not batch:
+                return batch_future
+            self._in_flight.append(batch)
+
+        updated_at = datetime.now()
+        rows = {field: [] for field in self.FIELDS}
+        for (account_id, folder, uid), changes in batch.items():
+            for field, value in changes.items():
+                rows[field].append((value, updated_at, account_id, folder, uid))
+
+        def write(conn):
+            updated = 0
+            for field, field_rows in rows.items():
+                if field_rows:
+                    updated += conn.executemany(
+                        f"UPDATE messages SET {field} = ?, last_sync = ? WHERE account_id = ? AND folder = ? AND uid = ?",
+                        field_rows,
+                    ).rowcount
+            return updated
+
+        def done(write_future: Future):
+            error = write_future.exception()
+            if error is not None:
+                logging.error(f"FlagBuffer: Flushing {len(batch)} messages failed: {error}")
+                batch_future.set_exception(error)
+            else:
+                logging.debug(f"FlagBuffer: Flushed flag changes of {len(batch)} messages")
+                batch_future.set_result(write_future.result())
+            with self._lock:
+                self._in_flight.remove(batch)
+
+        self._submit(write).add_done_callback(done)
+        return batch_future
+
+    def close(self):
+        """Flush buffered changes and wait for them to be committed"""
+        future = self.flush()
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
@@ -0,0 +1,201 @@
+import imaplib
+import logging
+import select
+import ssl
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+from utils.imap_manager import IMAPConnection
+from utils.mail import get_mail_settings
+
+class IMAPIdleListener:
+    """Dedicated IDLE connection on one folder reporting mailbox changes as they are pushed"""
+
+    REARM_SECONDS = 25 * 60
+    POLL_SECONDS = 1.0
+    RESPONSE_TIMEOUT_SECONDS = 30
+    RECONNECT_DELAY_SECONDS = 30
+    MAX_RECONNECT_DELAY_SECONDS = 600
+    CHANGE_RESPONSES = {b"EXISTS", b"EXPUNGE", b"FETCH", b"VANISHED"}
+
+    def __init__(
+        self,
+        account_data: Dict,
+        folder_name: str,
+        on_change: Callable[[str, str, bool], None],
+        rearm_seconds: float = REARM_SECONDS,
+    ):
+        self.account_data = account_data
+        self.folder_name = folder_name
+        self.on_change = on_change
+        self.rearm_seconds = rearm_seconds
+        self.email = str(account_data.get("email", "unknown"))
+        self.connection: Optional[IMAPConnection] = None
+        self.supported: Optional[bool] = None
+        self.idling = False
+        self._last_round: Optional[float] = None
+        self._tag_counter = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pushing(self) -> bool:
+        """Check whether changes are being pushed, in IDLE or between two rounds of a working connection"""
+        if self.idling:
+            return True
+        return self._last_round is not None and time.monotonic() - self._last_round < self.RESPONSE_TIMEOUT_SECONDS
+
+    def start(self):
+        """Start listening in a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name=f"IMAPIdle-{self.email}-{self.folder_name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, wait: bool = False):
+        """Stop listening, the IDLE connection is closed once the current round ends"""
+        self._stopped.set()
+        if self._thread is None or not self._thread.is_alive():
+            if self.connection is not None:
+                self.connection.logout()
+        elif wait and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.RESPONSE_TIMEOUT_SECONDS)
+
+    def _run(self):
+        delay = self.RECONNECT_DELAY_SECONDS
+        while not self._stopped.is_set():
+            try:
+                if not self._open():
+                    return
+                delay = self.RECONNECT_DELAY_SECONDS
+                self._notify(False)
+                while not self._stopped.is_set():
+                    changes = self._idle_once()
+                    if changes:
+                        self._notify(b"FETCH" in changes)
+            except (imaplib.IMAP4.error, ConnectionError, OSError) as e:
+                logging.warning(
+                    f"IDLE connection for {self.email} on '{self.folder_name}' lost: {e}, retrying in {delay}s"
+                )
+            except Exception as e:
+                logging.error(f"IDLE listener for {self.email} on '{self.folder_name}' failed: {e}")
+
+            self.idling = False
+            self._last_round = None
+            if self.connection is not None:
+                self.connection.logout()
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY_SECONDS)
+
+        if self.connection is not None:
+            self.connection.logout()
+        logging.debug(f"IDLE listener for {self.email} on '{self.folder_name}' stopped")
+
+    def _open(self) -> bool:
+        """Connect, authenticate and examine the folder, returning False when IDLE is unavailable"""
+        if self.connection is None:
+            mail_settings = get_mail_settings(self.account_data)
+            if not mail_settings:
+                raise ConnectionError("Could not get mail settings")
+            self.connection = IMAPConnection(self.account_data, mail_settings)
+
+        if not self.connection.connect() or not self.connection.authenticate():
+            raise ConnectionError("Failed to establish authenticated connection")
+
+        if not self.connection.has_capability("IDLE"):
+            logging.info(f"Server of {self.email} does not support IDLE, keeping interval sync")
+            self.supported = False
+            self.connection.logout()
+            return False
+
+        status, data = self.connection.select_folder(self.folder_name, readonly=True)
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"Could not examine folder '{self.folder_name}': {data}")
+
+        self.supported = True
+        logging.info(f"IDLE listener for {self.email} watching '{self.folder_name}'")
+        return True
+
+    def _notify(self, flags_changed: bool):
+        try:
+            self.on_change(self.email, self.folder_name, flags_changed)
+        except Exception as e:
+            logging.error(f"IDLE change callback for {self.email} failed: {e}")
+
+    def _change_response(self, line: bytes) -> Optional[bytes]:
+        words = line.split()
+        if words[:1] != [b"*"]:
+            return None
+        return next((word.upper() for word in words[1:3] if word.upper() in self.CHANGE_RESPONSES), None)
+
+    def _idle_once(self) -> Set[bytes]:
+        """Run one IDLE round until a change arrives, the re-arm time passes or the listener stops, returning the change responses seen"""
+        self._tag_counter += 1
+        tag = f"IDLE{self._tag_counter}".encode()
+        self.connection.connection.send(tag + b" IDLE\r\n")
+
+        while True:
+            line = self._read_line(self.RESPONSE_TIMEOUT_SECONDS)
+            if line is None:
+                raise TimeoutError("No response to IDLE")
+            if line.startswith(b"+"):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode(errors='replace')}")
+
+        self.idling = True
+        changes = set()
+        deadline = time.monotonic() + self.rearm_seconds
+        while not changes and not self._stopped.is_set() and time.monotonic() < deadline:
+            line = self._read_line(self.POLL_SECONDS)
+            if line is None:
+                continue
+            if line.split()[:2] == [b"*", b"BYE"]:
+                raise ConnectionError(f"Server closed IDLE: {line.decode(errors='replace')}")
+            change = self._change_response(line)
+            if change:
+                logging.debug(f"IDLE update for {self.email} on '{self.folder_name}': {line!r}")
+                changes.add(change)
+
+        self.connection.connection.send(b"DONE\r\n")
+        self.idling = False
+        while True:
+            line = self._read_line(self.RESPONSE_TIMEOUT_SECONDS)
+            if line is None:
+                raise TimeoutError("No response to DONE")
+            if line.startswith(tag):
+                if line.split()[1:2] != [b"OK"]:
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line.decode(errors='replace')}")
+                break
+            change = self._change_response(line)
+            if change:
+                changes.add(change)
+
+        self._last_round = time.monotonic()
+        self.connection.last_used = time.time()
+        return changes
+
+    def _has_buffered_data(self) -> bool:
+        """Check without blocking whether imaplib's reader holds or can read data"""
+        imap = self.connection.connection
+        imap.socket().setblocking(False)
+        try:
+            return bool(imap.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            imap.socket().settimeout(self.RESPONSE_TIMEOUT_SECONDS)
+
+    def _read_line(self, timeout: float) -> Optional[bytes]:
+        """Read one response line through imaplib's reader, or None when nothing arrives within the timeout"""
+        imap = self.connection.connection
+        if not self._has_buffered_data():
+            readable, _, _ = select.select([imap.socket()], [], [], timeout)
+            if not readable:
+                return None
+        line = imap.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return line.rstrip(b"\r\n")
@@ -4,7 +4,8 @@ import threading
 import time
 import logging
 import signal
-from typing import Optional, Dict, Any, Callable
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable, Iterator, List, Set, Tuple
 from utils.toolkit import GLib
 
 class IMAPConnection:
@@ -16,10 +17,66 @@ class IMAPConnection:
         self.connection: Optional[imaplib.IMAP4_SSL] = None
         self.last_used = 0
         self.is_authenticated = False
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
+        self.selected_mailbox: Optional[str] = None
+        self.selected_readonly = False
+        self.capabilities: Set[str] = set()
+        self.enabled: Set[str] = set()
         
         self.email = str(account_data.get("email", "unknown"))
 
+    @staticmethod
+    def quote_mailbox(folder_name: str) -> str:
+        """Quote a mailbox name containing spaces or special characters"""
+        if any(char in folder_name for char in ' []/"'):
+            escaped = folder_name.replace("\\", "\\\\").replace('"', '\\"')
+            return f'"{escaped}"'
+        return folder_name
+
+    def select_folder(self, folder_name: str, readonly: bool = False, refresh: bool = False) -> Tuple[str, list]:
+        """Select a mailbox unless it is already selected in a compatible mode, the message count is only returned by a fresh SELECT"""
+        with self.lock:
+            if not refresh and self.selected_mailbox == folder_name and (readonly or not self.selected_readonly):
+                logging.debug(f"Mailbox '{folder_name}' already selected for {self.email}, skipping SELECT")
+                return "OK", [None]
+
+            self.selected_mailbox = None
+            status, data = self.connection.select(self.quote_mailbox(folder_name), readonly)
+            if status == "OK":
+                self.selected_mailbox = folder_name
+                self.selected_readonly = readonly
+            return status, data
+
+    def has_capability(self, name: str) -> bool:
+        """Check whether the server advertised a capability after authentication"""
+        return name.upper() in self.capabilities
+
+    def untagged_responses(self, name: str) -> list:
+        """Take the untagged responses of a type collected since they were last taken"""
+        with self.lock:
+            if not self.connection:
+                return []
+            _, data = self.connection.response(name)
+            return [item for item in data if item is not None]
+
+    def _refresh_capabilities(self):
+        """Re-read capabilities after login and enable QRESYNC when the server offers it"""
+        status, data = self.connection.capability()
+        if status == "OK" and data and data[-1]:
+            line = data[-1].decode() if isinstance(data[-1], bytes) else str(data[-1])
+            self.connection.capabilities = tuple(line.upper().split())
+        self.capabilities = set(self.connection.capabilities)
+        self.enabled = set()
+
+        if "QRESYNC" in self.capabilities and "ENABLE" in self.capabilities:
+            try:
+                status, _ = self.connection.enable("QRESYNC")
+                if status == "OK":
+                    self.enabled.update(("QRESYNC", "CONDSTORE"))
+            except imaplib.IMAP4.error as e:
+                logging.warning(f"Could not enable QRESYNC for {self.email}: {e}")
+        logging.debug(f"Capabilities for {self.email}: {sorted(self.capabilities)}, enabled: {sorted(self.enabled)}")
+
     def connect(self) -> bool:
         """Establish connection to IMAP server"""
         with self.lock:
@@ -89,6 +146,7 @@ class IMAPConnection:
 
                 self.connection.authenticate("XOAUTH2", auth_callback)
                 self.is_authenticated = True
+                self._refresh_capabilities()
                 logging.info(f"OAuth2 authentication successful for {email}")
                 return True
 
@@ -118,6 +176,10 @@ class IMAPConnection:
     def execute_command(self, command: str, *args) -> tuple:
         """Execute an IMAP command with automatic reconnection"""
         with self.lock:
+            selected = None
+            if self.selected_mailbox and command not in ("LIST", "SELECT", "EXAMINE", "LOGOUT"):
+                selected = (self.selected_mailbox, self.selected_readonly)
+
             max_retries = 3
             for attempt in range(max_retries):
                 try:
@@ -126,6 +188,8 @@ class IMAPConnection:
                             raise Exception(
                                 "Failed to establish authenticated connection"
                             )
+                        if selected:
+                            self.select_folder(*selected)
 
                     self.last_used = time.time()
 
@@ -133,18 +197,27 @@ class IMAPConnection:
                     if command == "LIST":
                         result = self.connection.list(*args)
                     elif command == "SELECT":
-                        result = self.connection.select(*args)
+                        result = self.select_folder(*args)
+                    elif command == "EXAMINE":
+                        result = self.select_folder(args[0], True)
                     elif command == "FETCH":
                         result = self.connection.fetch(*args)
                     elif command == "SEARCH":
                         result = self.connection.search(*args)
+                    elif command == "STATUS":
+                        result = self.connection.status(*args)
                     elif command == "STORE":
                         result = self.connection.store(*args)
+                    elif command == "UID":
+                        result = self.connection.uid(*args)
+                    elif command == "NOOP":
+                        result = self.connection.noop()
                     elif command == "COPY":
                         result = self.connection.copy(*args)
                     elif command == "EXPUNGE":
                         result = self.connection.expunge()
                     elif command == "CLOSE":
+                        self.selected_mailbox = None
                         result = self.connection.close()
                     elif command == "LOGOUT":
                         result = self.connection.logout()
@@ -185,6 +258,10 @@ class IMAPConnection:
             pass
         self.connection = None
         self.is_authenticated = False
+        self.selected_mailbox = None
+        self.selected_readonly = False
+        self.capabilities = set()
+        self.enabled = set()
 
     def logout(self):
         """Close the connection"""
@@ -195,72 +272,235 @@ class IMAPConnection:
         """Check if connection has been idle for too long"""
         return time.time() - self.last_used > timeout_seconds
 
+    def check_health(self) -> bool:
+        """Check with a NOOP that the connection is still authenticated and responsive"""
+        with self.lock:
+            if not self.connection or not self.is_authenticated:
+                return False
+            try:
+                status, _ = self.connection.noop()
+                self.last_used = time.time()
+                return status == "OK"
+            except Exception as e:
+                logging.debug(f"Health check failed for {self.email}: {e}")
+                return False
+
+class IMAPConnectionPool:
+    """Authenticated connections of one account, each checked out by one thread at a time"""
+
+    MAX_CONNECTIONS = 4
+    CHECKOUT_TIMEOUT_SECONDS = 60
+    HEALTH_CHECK_AFTER_SECONDS = 30
+
+    def __init__(
+        self,
+        account_data: Dict[str, Any],
+        mail_settings: Dict[str, Any],
+        max_connections: int = MAX_CONNECTIONS,
+    ):
+        self.account_data = account_data
+        self.mail_settings = mail_settings
+        self.max_connections = max_connections
+        self.email = str(account_data.get("email", "unknown"))
+        self._idle: List[IMAPConnection] = []
+        self._in_use: Set[IMAPConnection] = set()
+        self._opening = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Get the number of open or opening connections"""
+        with self._condition:
+            return len(self._idle) + len(self._in_use) + self._opening
+
+    def checkout(self, timeout: Optional[float] = None) -> IMAPConnection:
+        """Take a healthy connection for exclusive use, opening one while under the limit"""
+        if timeout is None:
+            timeout = self.CHECKOUT_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"Connection pool for {self.email} is closed")
+                    if self._idle:
+                        connection = self._idle.pop()
+                        self._in_use.add(connection)
+                        break
+                    if len(self._in_use) + self._opening < self.max_connections:
+                        connection = None
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"No free IMAP connection for {self.email} after {timeout}s"
+                        )
+                    self._condition.wait(remaining)
+
+            if connection is None:
+                return self._open_connection()
+
+            if not connection.is_idle(self.HEALTH_CHECK_AFTER_SECONDS) or connection.check_health():
+                connection.last_used = time.time()
+                return connection
+
+            logging.debug(f"Dropping unhealthy pooled connection for {self.email}")
+            self.checkin(connection, discard=True)
+
+    def _open_connection(self) -> IMAPConnection:
+        connection = IMAPConnection(self.account_data, self.mail_settings)
+        try:
+            if not connection.connect() or not connection.authenticate():
+                connection.logout()
+                raise ConnectionError("Failed to establish authenticated connection")
+        except Exception:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+
+        connection.last_used = time.time()
+        with self._condition:
+            self._opening -= 1
+            self._in_use.add(connection)
+            logging.debug(
+                f"Opened pooled IMAP connection for {self.email} ({len(self._in_use) + len(self._idle)}/{self.max_connections})"
+            )
+        return connection
+
+    def checkin(self, connection: IMAPConnection, discard: bool = False):
+        """Return a checked out connection, closing it when discarded or the pool is closed"""
+        with self._condition:
+            self._in_use.discard(connection)
+            keep = not discard and not self._closed and connection.connection is not None
+            if keep:
+                connection.last_used = time.time()
+                self._idle.append(connection)
+            self._condition.notify()
+        if not keep:
+            connection.logout()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[IMAPConnection]:
+        """Check out a connection for a block, discarding it if the block breaks the session"""
+        connection = self.checkout(timeout)
+        discard = False
+        try:
+            yield connection
+        except (imaplib.IMAP4.error, OSError):
+            discard = True
+            raise
+        finally:
+            self.checkin(connection, discard=discard)
+
+    def reap_idle(self, timeout_seconds: int) -> int:
+        """Close idle connections unused for longer than timeout_seconds"""
+        with self._condition:
+            expired = [connection for connection in self._idle if connection.is_idle(timeout_seconds)]
+            self._idle = [connection for connection in self._idle if connection not in expired]
+        for connection in expired:
+            connection.logout()
+        if expired:
+            logging.debug(f"Reaped {len(expired)} idle IMAP connections for {self.email}")
+        return len(expired)
+
+    def close(self):
+        """Close idle connections now and in-use ones when they are checked in"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for connection in idle:
+            connection.logout()
+
 class IMAPConnectionManager:
-    """Manages IMAP connections for multiple accounts"""
+    """Manages a pool of IMAP connections per account"""
+
+    IDLE_TIMEOUT_SECONDS = 600
+    CLEANUP_INTERVAL_SECONDS = 60
 
-    def __init__(self):
-        self.connections: Dict[str, IMAPConnection] = {}
+    def __init__(self, max_connections_per_account: int = IMAPConnectionPool.MAX_CONNECTIONS):
+        self.pools: Dict[str, IMAPConnectionPool] = {}
+        self.max_connections_per_account = max_connections_per_account
         self.lock = threading.Lock()
         self.cleanup_thread = None
         self.running = True
         self._start_cleanup_thread()
 
-    def get_connection(
+    def get_pool(
         self, account_data: Dict[str, Any], mail_settings: Dict[str, Any]
-    ) -> IMAPConnection:
-        """Get or create a connection for an account"""
-        
+    ) -> IMAPConnectionPool:
+        """Get or create the connection pool of an account"""
         email = str(account_data.get("email", "unknown"))
 
         with self.lock:
-            if email not in self.connections:
-                logging.debug(f"Creating new IMAP connection for {email}")
-                self.connections[email] = IMAPConnection(account_data, mail_settings)
-            else:
-                connection = self.connections[email]
-                
-                if connection.is_idle():
-                    logging.debug(f"Connection for {email} is idle, refreshing")
-                    connection.logout()
-                    self.connections[email] = IMAPConnection(
-                        account_data, mail_settings
-                    )
+            pool = self.pools.get(email)
+            if pool is None:
+                logging.debug(f"Creating IMAP connection pool for {email}")
+                pool = IMAPConnectionPool(
+                    account_data, mail_settings, self.max_connections_per_account
+                )
+                self.pools[email] = pool
+            return pool
+
+    def checkout(
+        self,
+        account_data: Dict[str, Any],
+        mail_settings: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> IMAPConnection:
+        """Check out a connection of an account for exclusive use"""
+        return self.get_pool(account_data, mail_settings).checkout(timeout)
 
-            return self.connections[email]
+    def checkin(self, connection: IMAPConnection, discard: bool = False):
+        """Return a connection to its account's pool"""
+        with self.lock:
+            pool = self.pools.get(connection.email)
+        if pool is None:
+            connection.logout()
+        else:
+            pool.checkin(connection, discard=discard)
+
+    @contextmanager
+    def connection(
+        self,
+        account_data: Dict[str, Any],
+        mail_settings: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Iterator[IMAPConnection]:
+        """Check out a connection of an account for the duration of a block"""
+        with self.get_pool(account_data, mail_settings).connection(timeout) as connection:
+            yield connection
 
     def close_connection(self, email: str):
-        """Close a specific connection"""
+        """Close the connection pool of an account"""
         with self.lock:
-            if email in self.connections:
-                self.connections[email].logout()
-                del self.connections[email]
+            pool = self.pools.pop(email, None)
+        if pool is not None:
+            pool.close()
 
     def close_all_connections(self):
-        """Close all connections"""
+        """Close all connection pools"""
         with self.lock:
-            for connection in self.connections.values():
-                connection.logout()
-            self.connections.clear()
+            pools = list(self.pools.values())
+            self.pools.clear()
+        for pool in pools:
+            pool.close()
 
     def _start_cleanup_thread(self):
-        """Start background thread to clean up idle connections"""
+        """Start background thread to reap idle pooled connections"""
 
         def cleanup_loop():
             while self.running:
                 try:
-                    time.sleep(60)  
+                    time.sleep(self.CLEANUP_INTERVAL_SECONDS)
                     with self.lock:
-                        emails_to_remove = []
-                        for email, connection in self.connections.items():
-                            if connection.is_idle(timeout_seconds=600):  
-                                logging.debug(
-                                    f"Cleaning up idle connection for {email}"
-                                )
-                                connection.logout()
-                                emails_to_remove.append(email)
-
-                        for email in emails_to_remove:
-                            del self.connections[email]
+                        pools = list(self.pools.values())
+                    for pool in pools:
+                        pool.reap_idle(self.IDLE_TIMEOUT_SECONDS)
 
                 except Exception as e:
                     logging.error(f"Error in connection cleanup thread: {e}")
@@ -274,17 +514,20 @@ class IMAPConnectionManager:
         self.close_all_connections()
 
 _connection_manager = None
+_connection_manager_lock = threading.Lock()
 
 def get_connection_manager() -> IMAPConnectionManager:
     """Get the global connection manager instance"""
     global _connection_manager
-    if _connection_manager is None:
-        _connection_manager = IMAPConnectionManager()
-    return _connection_manager
+    with _connection_manager_lock:
+        if _connection_manager is None:
+            _connection_manager = IMAPConnectionManager()
+        return _connection_manager
 
 def shutdown_connection_manager():
     """Shutdown the global connection manager"""
     global _connection_manager
-    if _connection_manager:
-        _connection_manager.shutdown()
-        _connection_manager = None
+    with _connection_manager_lock:
+        manager, _connection_manager = _connection_manager, None
+    if manager:
+        manager.shutdown()
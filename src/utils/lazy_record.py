@@ -0,0 +1,111 @@
+import json
+import sqlite3
+from typing import Any, Dict, Iterator
+
+JSON_COLUMNS = {
+    "recipients": ("recipients", "[]"),
+    "cc": ("cc", "[]"),
+    "bcc": ("bcc", "[]"),
+    "reply_to": ("reply_to", "[]"),
+    "flags": ("flags", "[]"),
+    "headers": ("headers", "{}"),
+    "envelope": ("envelope", "{}"),
+    "bodystructure": ("bodystructure", "{}"),
+    "thread_references": ("thread_references", "[]"),
+}
+
+_PENDING = object()
+_PENDING_FIELDS = dict.fromkeys(JSON_COLUMNS, _PENDING)
+
+class LazyMessageRecord(dict):
+    """Message dict keeping its sqlite3.Row and decoding JSON columns on first access"""
+
+    __slots__ = ("_row",)
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row, fields: Dict[str, Any]) -> "LazyMessageRecord":
+        """Build a record from already converted fields and the row holding the JSON columns"""
+        record = cls(fields)
+        record._row = row
+        dict.update(record, _PENDING_FIELDS)
+        return record
+
+    def _resolve(self, key, value):
+        if value is _PENDING:
+            column, default = JSON_COLUMNS[key]
+            value = json.loads(self._row[column] or default)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _resolve_all(self):
+        for key, value in dict.items(self):
+            if value is _PENDING:
+                self._resolve(key, value)
+
+    def is_decoded(self, key) -> bool:
+        """Check whether a field is already decoded"""
+        return dict.get(self, key) is not _PENDING
+
+    def __getitem__(self, key):
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if not dict.__contains__(self, key):
+            return default
+        return self[key]
+
+    def __iter__(self) -> Iterator:
+        return dict.__iter__(self)
+
+    def items(self):
+        self._resolve_all()
+        return dict.items(self)
+
+    def raw_items(self) -> Iterator:
+        """Iterate over the fields without decoding, giving undecoded JSON columns as their row text"""
+        for key, value in dict.items(self):
+            yield key, self._row[JSON_COLUMNS[key][0]] if value is _PENDING else value
+
+    def values(self):
+        self._resolve_all()
+        return dict.values(self)
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            value = self[key]
+            dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._resolve_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def copy(self) -> "LazyMessageRecord":
+        record = type(self)(dict.items(self))
+        if hasattr(self, "_row"):
+            record._row = self._row
+        return record
+
+    def __eq__(self, other):
+        self._resolve_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        self._resolve_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        self._resolve_all()
+        return (dict, (dict(dict.items(self)),))
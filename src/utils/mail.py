@@ -1,36 +1,12 @@
 import dbus
-import imaplib
-import ssl
+import re
 import threading
 import logging
-import time
 from utils.toolkit import GLib
 from utils.message_parser import extract_best_text_from_message
+from utils.imap_manager import get_connection_manager, shutdown_connection_manager
 
-def get_oauth2_token(account_data):
-    try:
-        logging.debug(
-            f"Attempting to get OAuth2 token for account: {account_data.get('email', 'unknown')}"
-        )
-        bus = dbus.SessionBus()
-        logging.debug("Connected to D-Bus session bus")
-        account_obj = bus.get_object("org.gnome.OnlineAccounts", account_data["path"])
-        logging.debug(f"Got account object from path: {account_data['path']}")
-        oauth2_props = dbus.Interface(
-            account_obj, "org.gnome.OnlineAccounts.OAuth2Based"
-        )
-        logging.debug("Created OAuth2 interface")
-        access_token = oauth2_props.GetAccessToken()
-        logging.debug(
-            f"Retrieved access token, length: {len(access_token[0]) if access_token and access_token[0] else 0}"
-        )
-        return access_token[0] if access_token else None
-    except Exception as e:
-        logging.error(
-            f"Error getting OAuth2 token for {account_data.get('email', 'unknown')}: {e}"
-        )
-        logging.debug(f"Full account data: {account_data}")
-        return None
+HEADER_FETCH_ITEMS = "(ENVELOPE FLAGS UID BODY.PEEK[HEADER.FIELDS (DATE FROM TO CC SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES)])"
 
 def get_mail_settings(account_data):
     try:
@@ -62,215 +38,45 @@ def get_mail_settings(account_data):
         logging.debug(f"Account path: {account_data.get('path', 'unknown')}")
         return None
 
-def authenticate_imap_oauth2(mail, username, token):
-    logging.debug(f"Authenticating with OAuth2 for user: {username}")
-    auth_string = f"user={username}\x01auth=Bearer {token}\x01\x01"
-    logging.debug(f"Auth string length: {len(auth_string)}")
-
-    def auth_callback(response):
-        logging.debug(f"Auth callback called with response: {response}")
-        return auth_string.encode("utf-8")
-
-    try:
-        logging.debug("Attempting XOAUTH2 authentication...")
-        mail.authenticate("XOAUTH2", auth_callback)
-        logging.debug("XOAUTH2 authentication successful")
-    except Exception as e:
-        logging.error(f"XOAUTH2 authentication failed: {e}")
-        raise
-
-def connect_to_imap_server(mail_settings):
-    server = mail_settings.get("imap_host", "imap.gmail.com")
-    port = mail_settings.get("imap_port", 993)
-    use_ssl = mail_settings.get("imap_use_ssl", True)
-    use_tls = mail_settings.get("imap_use_tls", True)
-
-    logging.info(
-        f"Connecting to IMAP server: {server}:{port}, SSL: {use_ssl}, TLS: {use_tls}"
-    )
-    logging.debug(f"Full mail settings: {mail_settings}")
-
-    try:
-        if use_ssl:
-            logging.debug("Creating SSL context...")
-            context = ssl.create_default_context()
-            context.check_hostname = False
-            context.verify_mode = ssl.CERT_NONE
-            logging.debug("Connecting with SSL...")
-            mail = imaplib.IMAP4_SSL(server, port, ssl_context=context)
-            logging.debug("SSL connection established")
-        else:
-            logging.debug("Connecting without SSL...")
-            mail = imaplib.IMAP4(server, port)
-            if use_tls:
-                logging.debug("Starting TLS...")
-                mail.starttls()
-                logging.debug("TLS started")
-            logging.debug("Plain connection established")
-
-        logging.info(f"Successfully connected to IMAP server: {server}:{port}")
-        return mail
-    except Exception as e:
-        logging.error(f"Failed to connect to IMAP server {server}:{port}: {e}")
-        raise
-
-_connection_cache = {}
-_connection_cache_lock = threading.Lock()
+def handle_imap_operation_with_retry(account_data, mail_settings, operation_func, *args, **kwargs):
+    """Run an IMAP operation on a pooled connection, retrying once on a fresh one after state errors"""
+    email = account_data.get("email", "unknown")
+    manager = get_connection_manager()
 
-def logout_and_remove_from_cache(mail, account_data):
-    """Logout and remove connection from cache"""
-    email = str(account_data.get("email", "unknown"))
+    def run_operation():
+        with manager.connection(account_data, mail_settings) as connection:
+            return operation_func(connection, *args, **kwargs)
 
     try:
-        mail.logout()
-    except Exception as e:
-        logging.warning(f"Error during logout for {email}: {e}")
+        return run_operation()
 
-    
-    with _connection_cache_lock:
-        if email in _connection_cache:
-            del _connection_cache[email]
-            logging.debug(f"Removed connection from cache for {email}")
+    except ConnectionError as e:
+        logging.error(f"Failed to connect and authenticate for {email}: {e}")
+        return False, "Authentication failed"
 
-def handle_imap_operation_with_retry(account_data, mail_settings, operation_func, *args, **kwargs):
-    """Handle IMAP operations with automatic retry on LOGOUT state errors"""
-    email = account_data.get("email", "unknown")
-    
-    try:
-        
-        mail = connect_and_authenticate(mail_settings, account_data)
-        if not mail:
-            return False, "Authentication failed"
-            
-        return operation_func(mail, *args, **kwargs)
-        
     except Exception as e:
         error_str = str(e)
-        
+
         if ("LOGOUT" in error_str and "illegal" in error_str.lower()) or \
            "unexpected response" in error_str.lower() or \
            "command" in error_str.lower() and "=>" in error_str:
-            logging.warning(f"Connection state error for {email}: {error_str}, recreating connection")
-            
-            
+            logging.warning(f"Connection state error for {email}: {error_str}, retrying on a fresh connection")
+
             try:
-                mail = connect_and_authenticate(mail_settings, account_data, force=True)
-                if not mail:
-                    return False, "Authentication failed after connection retry"
-                    
-                return operation_func(mail, *args, **kwargs)
-                
+                return run_operation()
+
+            except ConnectionError:
+                return False, "Authentication failed after connection retry"
             except Exception as retry_e:
                 logging.error(f"Retry failed for {email}: {retry_e}")
                 return False, f"Operation failed after retry: {retry_e}"
         else:
-            
             raise
 
 def cleanup_all_connections():
-    """Close all cached connections - call this on app shutdown"""
-    with _connection_cache_lock:
-        connection_count = len(_connection_cache)
-        if connection_count > 0:
-            logging.debug(
-                f"Cache contents before cleanup: {list(_connection_cache.keys())}"
-            )
-
-        for email, (connection, _) in _connection_cache.items():
-            try:
-                logging.debug(f"Closing cached connection for {email}")
-                connection.logout()
-            except Exception as e:
-                logging.warning(f"Error closing cached connection for {email}: {e}")
-
-        _connection_cache.clear()
-        logging.info(f"Cleaned up {connection_count} cached connections")
-
-def connect_and_authenticate(mail_settings, account_data, force=False):
-    """Connect to IMAP server and authenticate in one step, with connection caching"""
-    email = str(account_data.get("email", "unknown"))
-
-    with _connection_cache_lock:
-        
-        if email in _connection_cache:
-            if force:
-                
-                logging.debug(f"Force recreating connection for {email}")
-                cached_connection, _ = _connection_cache[email]
-                try:
-                    cached_connection.logout()
-                except:
-                    pass
-                del _connection_cache[email]
-            else:
-                cached_connection, last_used = _connection_cache[email]
-                current_time = time.time()
-
-                
-                if current_time - last_used < 300:  
-                    logging.debug(f"Reusing cached connection for {email}")
-                    _connection_cache[email] = (cached_connection, current_time)
-                    return cached_connection
-                else:
-                    
-                    logging.debug(f"Removing stale cached connection for {email}")
-                    try:
-                        cached_connection.logout()
-                    except:
-                        pass
-                    del _connection_cache[email]
-
-    
-    try:
-        logging.debug(f"Creating new connection for {email}")
-        mail = connect_to_imap_server(mail_settings)
-
-        
-        if not authenticate_imap(mail, account_data, mail_settings):
-            
-            try:
-                mail.logout()
-            except:
-                pass
-            return None
-
-        
-        with _connection_cache_lock:
-            _connection_cache[email] = (mail, time.time())
-            logging.debug(f"Cached new connection for {email}")
-
-        return mail
-
-    except Exception as e:
-        logging.error(f"Failed to connect and authenticate: {e}")
-        return None
-
-def authenticate_imap(mail, account_data, mail_settings):
-    email = account_data["email"]
-    username = mail_settings.get("imap_username", email)
-    auth_xoauth2 = account_data.get("has_oauth2", False)
-
-    logging.debug(f"Authenticating IMAP for email: {email}, username: {username}")
-    logging.debug(f"OAuth2 available: {auth_xoauth2}")
-
-    if not auth_xoauth2:
-        logging.warning(f"Account {email} does not support OAuth2")
-        return False
-
-    logging.info(f"Account {email} supports OAuth2, attempting authentication")
-    token = get_oauth2_token(account_data)
-    if not token:
-        logging.error(f"Failed to get OAuth2 token for {email}")
-        return False
-
-    try:
-        authenticate_imap_oauth2(mail, username, token)
-        logging.info(f"OAuth2 authentication successful for {email}")
-        return True
-    except Exception as e:
-        logging.error(f"OAuth2 authentication failed for {email}: {e}")
-        logging.debug(f"Authentication exception details: {type(e).__name__}: {str(e)}")
-        return False
+    """Close all pooled connections - call this on app shutdown"""
+    shutdown_connection_manager()
+    logging.info("Closed all pooled IMAP connections")
 
 def parse_folder_line(folder_line):
     logging.debug(f"Parsing folder line: {folder_line} (type: {type(folder_line)})")
@@ -307,12 +113,12 @@ def parse_folder_line(folder_line):
     logging.debug("Could not parse folder name")
     return None
 
-def _get_folders_operation(mail, email):
+def _get_folders_operation(connection, email):
     """Internal operation function for fetching folders"""
     logging.debug(f"Listing folders for {email}")
     
     try:
-        status, folder_list = mail.list()
+        status, folder_list = connection.execute_command("LIST")
         logging.debug(
             f"IMAP LIST command returned: status={status}, count={len(folder_list) if folder_list else 0}"
         )
@@ -352,9 +158,9 @@ def _get_folders_operation(mail, email):
         logging.warning(f"No folders found for {email}")
         return False, "No folders found"
 
-def get_folders_from_imap(mail, email):
+def get_folders_from_imap(connection, email):
     try:
-        success, result = _get_folders_operation(mail, email)
+        success, result = _get_folders_operation(connection, email)
         if success:
             return result
         else:
@@ -420,30 +226,14 @@ def fetch_imap_folders(account_data, callback):
     thread.daemon = True
     thread.start()
 
-def _fetch_messages_operation(mail, folder_name, email, limit):
+def _fetch_messages_operation(connection, folder_name, email, limit):
     """Internal operation function for fetching messages"""
     
     logging.debug(f"Selecting folder '{folder_name}' for {email}")
-    logging.debug(f"Folder name bytes: {folder_name.encode('utf-8')}")
     logging.debug(f"Folder name repr: {repr(folder_name)}")
     
     try:
-        
-        if (
-            " " in folder_name
-            or "[" in folder_name
-            or "]" in folder_name
-            or "/" in folder_name
-        ):
-            
-            quoted_folder = f'"{folder_name}"'
-            logging.debug(
-                f"Calling mail.select() with quoted folder: {quoted_folder}"
-            )
-            status, data = mail.select(quoted_folder)
-        else:
-            logging.debug(f"Calling mail.select() with folder: {folder_name}")
-            status, data = mail.select(folder_name)
+        status, data = connection.select_folder(folder_name, readonly=True, refresh=True)
         logging.debug(f"SELECT response: status={status}, data={data}")
         
         if status != "OK":
@@ -469,10 +259,7 @@ def _fetch_messages_operation(mail, folder_name, email, limit):
     logging.debug(f"Fetching messages {msg_range} from folder '{folder_name}'")
 
     
-    status, data = mail.fetch(
-        msg_range,
-        "(ENVELOPE FLAGS UID BODY.PEEK[HEADER.FIELDS (DATE FROM TO CC SUBJECT MESSAGE-ID IN-REPLY-TO REFERENCES)])",
-    )
+    status, data = connection.execute_command("FETCH", msg_range, HEADER_FETCH_ITEMS)
     if status != "OK":
         return False, f"Could not fetch message headers: {data}"
 
@@ -533,6 +320,219 @@ def fetch_messages_from_folder(account_data, folder_name, callback, limit=50):
     thread.daemon = True
     thread.start()
 
+def parse_mailbox_status(status_data):
+    """Parse a STATUS response into a dict of upper-case item names and integer values"""
+    line = status_data[0] if status_data else b""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    match = re.search(r"\(([^()]*)\)\s*$", line or "")
+    if not match:
+        return {}
+    parts = match.group(1).split()
+    return {
+        parts[i].upper(): int(parts[i + 1])
+        for i in range(0, len(parts) - 1, 2)
+        if parts[i + 1].isdigit()
+    }
+
+def parse_uid_ranges(uid_set):
+    """Parse an IMAP UID set such as 3:5,9 into inclusive (low, high) ranges"""
+    ranges = []
+    for part in uid_set.split(","):
+        bounds = [int(bound) for bound in part.split(":") if bound.isdigit()]
+        if bounds:
+            ranges.append((min(bounds), max(bounds)))
+    return ranges
+
+def parse_vanished_responses(responses):
+    """Collect the UID ranges reported by untagged VANISHED responses"""
+    ranges = []
+    for response in responses:
+        line = response.decode("utf-8", errors="replace") if isinstance(response, bytes) else str(response)
+        ranges.extend(parse_uid_ranges(line.replace("(EARLIER)", "").strip()))
+    return ranges
+
+def parse_flag_updates(fetch_data):
+    """Parse FETCH (UID FLAGS) responses into a mapping of UID to flag list"""
+    updates = {}
+    for item in fetch_data:
+        if isinstance(item, tuple):
+            item = item[0]
+        if not item:
+            continue
+        line = item.decode("utf-8", errors="replace") if isinstance(item, bytes) else str(item)
+        uid_match = re.search(r"\bUID (\d+)", line)
+        flags_match = re.search(r"\bFLAGS \(([^)]*)\)", line)
+        if uid_match and flags_match:
+            updates[int(uid_match.group(1))] = flags_match.group(1).split()
+    return updates
+
+def read_mailbox_status(connection, folder_name, condstore):
+    """Get the message count, UIDNEXT, UIDVALIDITY and HIGHESTMODSEQ of a folder, from a fresh SELECT when the connection has it selected"""
+    if connection.selected_mailbox != folder_name:
+        status_items = "(MESSAGES UIDNEXT UIDVALIDITY HIGHESTMODSEQ)" if condstore else "(MESSAGES UIDNEXT UIDVALIDITY)"
+        status, data = connection.execute_command(
+            "STATUS", connection.quote_mailbox(folder_name), status_items
+        )
+        return status, parse_mailbox_status(data) if status == "OK" else data
+
+    status, data = connection.select_folder(folder_name, readonly=True, refresh=True)
+    if status != "OK":
+        return status, data
+    mailbox = {"MESSAGES": int(data[0]) if data and data[0] else 0}
+    for name in ("UIDNEXT", "UIDVALIDITY", "HIGHESTMODSEQ"):
+        values = connection.untagged_responses(name)
+        if values:
+            mailbox[name] = int(values[-1])
+    return status, mailbox
+
+def _sync_folder_operation(connection, folder_name, email, sync_state, limit, force=False, refresh_flags=False):
+    """Internal operation function syncing a folder incrementally from its stored UID and modseq state, refresh_flags fetches flags even when the folder looks unchanged"""
+    sync_state = sync_state or {}
+    condstore = connection.has_capability("CONDSTORE") or "CONDSTORE" in connection.enabled
+    qresync = "QRESYNC" in connection.enabled
+    status, mailbox = read_mailbox_status(connection, folder_name, condstore)
+    if status != "OK":
+        return False, f"Could not get status of folder '{folder_name}': {mailbox}"
+
+    result = {
+        "mode": "unchanged",
+        "messages": [],
+        "present_uids": None,
+        "vanished_ranges": None,
+        "flag_updates": {},
+        "uid_validity": mailbox.get("UIDVALIDITY"),
+        "uid_next": mailbox.get("UIDNEXT"),
+        "total_messages": mailbox.get("MESSAGES", 0),
+        "highest_modseq": mailbox.get("HIGHESTMODSEQ"),
+        "last_uid": sync_state.get("last_uid"),
+    }
+    logging.debug(f"STATUS of '{folder_name}' for {email}: {mailbox}, stored state: {sync_state}")
+
+    last_uid = sync_state.get("last_uid")
+    stored_modseq = sync_state.get("highest_modseq")
+    same_validity = (
+        result["uid_validity"] is not None
+        and sync_state.get("uid_validity") == result["uid_validity"]
+        and last_uid is not None
+    )
+
+    if not same_validity:
+        logging.info(f"Full resync of '{folder_name}' for {email}: UIDVALIDITY changed or no sync state")
+        success, messages = _fetch_messages_operation(connection, folder_name, email, limit)
+        if not success:
+            return False, messages
+        result["mode"] = "full"
+        result["messages"] = messages
+        result["last_uid"] = max([m["uid"] for m in messages if m.get("uid")], default=0)
+        return True, result
+
+    if (
+        not force
+        and not refresh_flags
+        and sync_state.get("uid_next") == result["uid_next"]
+        and sync_state.get("total_messages") == result["total_messages"]
+        and (not condstore or stored_modseq == result["highest_modseq"])
+    ):
+        logging.debug(f"Folder '{folder_name}' unchanged for {email}, nothing to fetch")
+        return True, result
+
+    connection.untagged_responses("VANISHED")
+    status, data = connection.select_folder(folder_name, readonly=True)
+    if status != "OK":
+        return False, f"Could not select folder '{folder_name}': status={status}"
+
+    result["mode"] = "incremental"
+    if result["uid_next"] is None or result["uid_next"] > last_uid + 1:
+        status, data = connection.execute_command(
+            "UID", "FETCH", f"{last_uid + 1}:*", HEADER_FETCH_ITEMS
+        )
+        if status != "OK":
+            return False, f"Could not fetch new message headers: {data}"
+        messages = [
+            message
+            for message in parse_fetched_messages(data, email, folder_name)
+            if message.get("uid") and message["uid"] > last_uid
+        ]
+        messages.reverse()
+        result["messages"] = messages
+        result["last_uid"] = max([last_uid] + [m["uid"] for m in messages])
+
+    lowest_uid = sync_state.get("lowest_uid")
+    changed_since = condstore and stored_modseq is not None and not force
+    if changed_since:
+        fetch_flags = refresh_flags or result["highest_modseq"] != stored_modseq
+    else:
+        fetch_flags = force or refresh_flags
+    if lowest_uid is not None and fetch_flags:
+        modifiers = []
+        if changed_since:
+            modifiers = [f"(CHANGEDSINCE {stored_modseq} VANISHED)" if qresync else f"(CHANGEDSINCE {stored_modseq})"]
+        status, data = connection.execute_command(
+            "UID", "FETCH", f"{lowest_uid}:{last_uid}", "(UID FLAGS)", *modifiers
+        )
+        if status != "OK":
+            return False, f"Could not fetch changed flags: {data}"
+        result["flag_updates"] = {
+            uid: flags for uid, flags in parse_flag_updates(data).items() if uid <= last_uid
+        }
+
+    vanished = connection.untagged_responses("VANISHED")
+    if qresync and changed_since:
+        result["vanished_ranges"] = parse_vanished_responses(vanished)
+    else:
+        known_total = (sync_state.get("total_messages") or 0) + len(result["messages"])
+        if force or result["total_messages"] != known_total:
+            status, data = connection.execute_command("UID", "SEARCH", None, "ALL")
+            if status != "OK":
+                return False, f"Could not list message UIDs: {data}"
+            result["present_uids"] = {int(uid) for uid in (data[0] or b"").split()}
+
+    logging.info(
+        f"Incremental sync of '{folder_name}' for {email}: {len(result['messages'])} new, "
+        f"{len(result['flag_updates'])} flag changes"
+    )
+    return True, result
+
+def sync_folder_from_imap(account_data, folder_name, sync_state, callback, limit=50, force=False, refresh_flags=False):
+    """Sync a folder from its stored UIDVALIDITY/UIDNEXT state, fetching only new messages"""
+
+    def sync():
+        try:
+            email = account_data["email"]
+            mail_settings = get_mail_settings(account_data)
+            if not mail_settings:
+                logging.error(f"No mail settings for account: {email}")
+                GLib.idle_add(callback, "Error: Could not get mail settings", None)
+                return
+
+            success, result = handle_imap_operation_with_retry(
+                account_data,
+                mail_settings,
+                _sync_folder_operation,
+                folder_name,
+                email,
+                sync_state,
+                limit,
+                force,
+                refresh_flags,
+            )
+
+            if success:
+                GLib.idle_add(callback, None, result)
+            else:
+                GLib.idle_add(callback, f"Error: {result}", None)
+
+        except Exception as e:
+            logging.error(
+                f"Failed to sync folder '{folder_name}' for {account_data.get('email', 'unknown')}: {e}"
+            )
+            GLib.idle_add(callback, "Error: Failed to connect to mail server", None)
+
+    thread = threading.Thread(target=sync)
+    thread.daemon = True
+    thread.start()
+
 def parse_fetched_messages(fetch_data, account_email, folder_name):
     """Parse fetched message data into Message objects"""
     import email
@@ -664,28 +664,18 @@ def decode_header_value(header_value):
         logging.debug(f"Error decoding header '{header_value}': {e}")
         return header_value
 
-def _fetch_message_body_operation(mail, folder_name, uid, email):
+def _fetch_message_body_operation(connection, folder_name, uid, email):
     """Internal operation function for fetching message body"""
     logging.debug(f"Fetching message body for UID {uid} from folder '{folder_name}'")
     
     try:
-        
-        if (
-            " " in folder_name
-            or "[" in folder_name
-            or "]" in folder_name
-            or "/" in folder_name
-        ):
-            quoted_folder = f'"{folder_name}"'
-            status, data = mail.select(quoted_folder)
-        else:
-            status, data = mail.select(folder_name)
+        status, data = connection.select_folder(folder_name, readonly=True)
         
         if status != "OK":
             return False, f"Could not select folder '{folder_name}': status={status}"
         
         
-        status, data = mail.uid("FETCH", str(uid), "BODY.PEEK[]")
+        status, data = connection.execute_command("UID", "FETCH", str(uid), "BODY.PEEK[]")
         if status != "OK":
             return False, f"Could not fetch message body: {data}"
         
@@ -710,31 +700,44 @@ def _fetch_message_body_operation(mail, folder_name, uid, email):
         else:
             return False, f"Error fetching message body: {error_str}"
 
-def fetch_message_body_from_imap(account_data, folder_name, uid, callback):
-    """Fetch message body from IMAP for a specific message"""
+def fetch_message_body_from_imap(account_data, folder_name, uid, callback, storage=None):
+    """Fetch message body for a specific message, from the raw message cache when possible"""
     logging.debug(f"Starting to fetch message body for UID {uid} from folder {folder_name}")
     
     def fetch_body():
         try:
             email = account_data["email"]
-            logging.info(f"Fetching message body for UID {uid} from folder '{folder_name}'")
-            
-            mail_settings = get_mail_settings(account_data)
-            if not mail_settings:
-                error_msg = "Error: Could not get mail settings"
-                logging.error(f"No mail settings for account: {email}")
-                GLib.idle_add(callback, error_msg, None)
-                return
-            
-            
-            success, result = handle_imap_operation_with_retry(
-                account_data,
-                mail_settings,
-                _fetch_message_body_operation,
-                folder_name,
-                uid,
-                email
-            )
+            success, result = False, None
+            if storage:
+                result = storage.get_raw_message(uid, folder_name, email)
+                success = result is not None
+                if success:
+                    logging.info(f"Using cached raw message for UID {uid} from folder '{folder_name}'")
+
+            if not success:
+                logging.info(f"Fetching message body for UID {uid} from folder '{folder_name}'")
+
+                mail_settings = get_mail_settings(account_data)
+                if not mail_settings:
+                    error_msg = "Error: Could not get mail settings"
+                    logging.error(f"No mail settings for account: {email}")
+                    GLib.idle_add(callback, error_msg, None)
+                    return
+
+                success, result = handle_imap_operation_with_retry(
+                    account_data,
+                    mail_settings,
+                    _fetch_message_body_operation,
+                    folder_name,
+                    uid,
+                    email
+                )
+
+                if success and storage:
+                    try:
+                        storage.store_raw_message(uid, folder_name, email, result)
+                    except Exception as e:
+                        logging.warning(f"Could not cache raw message for UID {uid}: {e}")
             
             if success:
                 
@@ -803,26 +806,77 @@ def mark_message_as_read_on_imap(account_data, folder_name, uid, callback):
     thread.daemon = True
     thread.start()
 
-def _mark_message_read_operation(mail, folder_name, uid, email):
+def set_message_flag_on_imap(account_data, folder_name, uid, flag, enabled, callback):
+    """Add or remove a flag of a message on the IMAP server"""
+    logging.debug(f"Starting to {'set' if enabled else 'clear'} {flag} on message UID {uid} in folder {folder_name}")
+
+    def store_flag():
+        try:
+            email = account_data["email"]
+            mail_settings = get_mail_settings(account_data)
+            if not mail_settings:
+                logging.error(f"No mail settings for account: {email}")
+                GLib.idle_add(callback, "Error: Could not get mail settings", None)
+                return
+
+            success, result = handle_imap_operation_with_retry(
+                account_data,
+                mail_settings,
+                _set_message_flag_operation,
+                folder_name,
+                uid,
+                flag,
+                enabled,
+                email,
+            )
+
+            if success:
+                GLib.idle_add(callback, None, result)
+            else:
+                GLib.idle_add(callback, f"Error: {result}", None)
+
+        except Exception as e:
+            logging.error(f"Failed to update {flag} on message UID {uid}: {e}")
+            GLib.idle_add(callback, "Error: Failed to connect to mail server", None)
+
+    thread = threading.Thread(target=store_flag)
+    thread.daemon = True
+    thread.start()
+
+def _set_message_flag_operation(connection, folder_name, uid, flag, enabled, email):
+    """Internal operation function for adding or removing a message flag"""
+    try:
+        status, data = connection.select_folder(folder_name)
+        if status != "OK":
+            return False, f"Could not select folder '{folder_name}': status={status}"
+
+        status, data = connection.execute_command(
+            "UID", "STORE", str(uid), "+FLAGS" if enabled else "-FLAGS", f"({flag})"
+        )
+        if status != "OK":
+            return False, f"Could not update {flag}: {data}"
+
+        logging.debug(f"Successfully {'set' if enabled else 'cleared'} {flag} on UID {uid} for {email}")
+        return True, f"{flag} {'set' if enabled else 'cleared'}"
+
+    except Exception as e:
+        error_str = str(e)
+        if "unexpected response" in error_str.lower() or "command" in error_str.lower():
+            raise
+        else:
+            return False, f"Error updating {flag}: {error_str}"
+
+def _mark_message_read_operation(connection, folder_name, uid, email):
     """Internal operation function for marking message as read"""
     logging.debug(f"Marking message UID {uid} as read in folder '{folder_name}'")
     
     try:
-        if (
-            " " in folder_name
-            or "[" in folder_name
-            or "]" in folder_name
-            or "/" in folder_name
-        ):
-            quoted_folder = f'"{folder_name}"'
-            status, data = mail.select(quoted_folder)
-        else:
-            status, data = mail.select(folder_name)
+        status, data = connection.select_folder(folder_name)
         
         if status != "OK":
             return False, f"Could not select folder '{folder_name}': status={status}"
         
-        status, data = mail.uid("STORE", str(uid), "+FLAGS", "\\Seen")
+        status, data = connection.execute_command("UID", "STORE", str(uid), "+FLAGS", "\\Seen")
         if status != "OK":
             return False, f"Could not mark message as read: {data}"
         
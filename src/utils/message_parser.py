@@ -3,6 +3,7 @@ import email.utils
 import email.header
 from typing import Dict, List, Optional, Any, Tuple
 import re
+from datetime import datetime
 from models.message import Message
 
 def parse_message_from_imap(uid: int, fetch_data: Tuple) -> Optional[Message]:
@@ -265,6 +266,23 @@ def parse_flags(flags_data) -> List[str]:
 
     return flags
 
+def parse_date_epoch(date_value) -> int:
+    """Parse an RFC 2822 or ISO 8601 date into a UTC epoch timestamp, 0 when unknown"""
+    if not date_value:
+        return 0
+
+    try:
+        if isinstance(date_value, datetime):
+            return int(date_value.timestamp())
+
+        parsed_date = email.utils.parsedate_tz(date_value)
+        if parsed_date:
+            return int(email.utils.mktime_tz(parsed_date))
+
+        return int(datetime.fromisoformat(date_value).timestamp())
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
 def create_message_from_raw_email(
     raw_email: str, uid: Optional[int] = None
 ) -> Optional[Message]:
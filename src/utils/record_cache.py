@@ -0,0 +1,97 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from utils.lazy_record import LazyMessageRecord
+
+RecordKey = Tuple[str, str, int]
+
+def estimate_record_size(value) -> int:
+    """Approximate the memory held by a message record, sizing undecoded JSON fields by their raw text"""
+    if isinstance(value, dict):
+        items = value.raw_items() if isinstance(value, LazyMessageRecord) else value.items()
+        return sys.getsizeof(value) + sum(
+            estimate_record_size(key) + estimate_record_size(item) for key, item in items
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_record_size(item) for item in value)
+    return sys.getsizeof(value)
+
+class MessageRecordCache:
+    """Bounded LRU of decoded message records keyed by (account_id, folder, uid) with size-aware eviction"""
+
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._records: "OrderedDict[RecordKey, Tuple[Dict, int]]" = OrderedDict()
+        self._size = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(account_id: str, folder: str, uid: int) -> RecordKey:
+        """Get the cache key of a message"""
+        return (account_id, folder, int(uid))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def generation(self) -> int:
+        """Get a token to pass to put, taken before reading the record from the database"""
+        return self._generation
+
+    def get(self, key: RecordKey) -> Optional[Dict]:
+        """Get a shallow copy of a cached record, marking it recently used"""
+        with self._lock:
+            entry = self._records.get(key)
+            if entry is None:
+                return None
+            self._records.move_to_end(key)
+            record = entry[0]
+        return record.copy()
+
+    def put(self, key: RecordKey, record: Dict, generation: int) -> bool:
+        """Cache a record unless an invalidation happened since the generation token was taken"""
+        cached = record.copy()
+        size = estimate_record_size(cached)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._discard(key)
+            self._records[key] = (cached, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._records.popitem(last=False)
+                self._size -= evicted_size
+        return True
+
+    def invalidate(self, key: RecordKey):
+        """Drop one record"""
+        self.invalidate_many([key])
+
+    def invalidate_many(self, keys: Iterable[RecordKey]):
+        """Drop a set of records"""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._discard(key)
+
+    def clear(self):
+        """Drop every record"""
+        with self._lock:
+            self._generation += 1
+            self._records.clear()
+            self._size = 0
+
+    def _discard(self, key: RecordKey):
+        entry = self._records.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
@@ -0,0 +1,58 @@
+import json
+import sqlite3
+from typing import Iterable, List, Tuple
+from utils.body_compression import decompress_body
+
+IndexRow = Tuple[int, str, str, str]
+
+INDEXED_TEXT_SQL = """
+    SELECT messages.id, messages.subject,
+        COALESCE(messages.sender_name, '') || ' ' || COALESCE(messages.sender_email, ''),
+        message_bodies.body_text
+    FROM messages
+    LEFT JOIN message_bodies ON message_bodies.id = messages.id
+    WHERE messages.id IN (SELECT value FROM json_each(?))
+"""
+
+def message_ids(conn: sqlite3.Connection, account_id: str, folder: str, uids: Iterable[int]) -> List[int]:
+    """Get the row ids of a folder's messages by UID"""
+    return [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT id FROM messages
+            WHERE account_id = ? AND folder = ? AND uid IN (SELECT value FROM json_each(?))
+        """,
+            (account_id, folder, json.dumps(list(uids))),
+        )
+    ]
+
+def _indexed_rows(conn: sqlite3.Connection, ids: Iterable[int]) -> List[IndexRow]:
+    """Get the subject, sender and decompressed body text a message is indexed with"""
+    return [
+        (row_id, subject, sender, decompress_body(body))
+        for row_id, subject, sender, body in conn.execute(INDEXED_TEXT_SQL, (json.dumps(list(ids)),))
+    ]
+
+def unindex_messages(conn: sqlite3.Connection, ids: Iterable[int]) -> int:
+    """Remove messages from the contentless search index, before their text changes or they are deleted"""
+    indexed = [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM messages_fts_docsize WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(ids)),),
+        )
+    ]
+    if not indexed:
+        return 0
+    return conn.executemany(
+        "INSERT INTO messages_fts (messages_fts, rowid, subject, sender, body) VALUES ('delete', ?, ?, ?, ?)",
+        _indexed_rows(conn, indexed),
+    ).rowcount
+
+def index_messages(conn: sqlite3.Connection, ids: Iterable[int]) -> int:
+    """Add messages to the contentless search index from their current subject, sender and body"""
+    return conn.executemany(
+        "INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (?, ?, ?, ?)",
+        _indexed_rows(conn, ids),
+    ).rowcount
@@ -1,11 +1,162 @@
 import sqlite3
+import base64
 import json
+import re
 import threading
 import logging
+import time
+from concurrent.futures import Future
+from contextlib import closing
+from functools import partial
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Tuple
 from pathlib import Path
 from utils.toolkit import GLib
+from utils.message_parser import parse_date_epoch
+from utils.storage_migrations import run_migrations
+from utils.body_compression import compress_body, decompress_body
+from utils.blob_store import RawMessageStore
+from utils.thread_index import assign_thread_ids, refresh_queued_threads
+from utils.storage_writer import StorageWriter, WriteJob
+from utils.storage_compactor import StorageCompactor
+from utils.record_cache import MessageRecordCache
+from utils.lazy_record import LazyMessageRecord
+from utils.address_index import extract_message_addresses, index_message_addresses
+from utils.search_index import message_ids, index_messages, unindex_messages
+from utils.flag_buffer import FlagBuffer
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO messages (
+        uid, folder, account_id, message_id, subject,
+        sender_name, sender_email, recipients, cc, bcc, reply_to,
+        date_sent, date_epoch, flags, is_read, is_flagged, is_deleted, is_draft, is_answered,
+        has_attachments, headers, envelope, bodystructure,
+        thread_subject, thread_references, in_reply_to, message_references,
+        sync_status, last_sync
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(account_id, folder, uid) DO UPDATE SET
+        message_id = excluded.message_id,
+        subject = excluded.subject,
+        sender_name = excluded.sender_name,
+        sender_email = excluded.sender_email,
+        recipients = excluded.recipients,
+        cc = excluded.cc,
+        bcc = excluded.bcc,
+        reply_to = excluded.reply_to,
+        date_sent = excluded.date_sent,
+        date_epoch = excluded.date_epoch,
+        flags = excluded.flags,
+        is_read = excluded.is_read,
+        is_flagged = excluded.is_flagged,
+        is_deleted = excluded.is_deleted,
+        is_draft = excluded.is_draft,
+        is_answered = excluded.is_answered,
+        has_attachments = excluded.has_attachments,
+        headers = excluded.headers,
+        envelope = excluded.envelope,
+        bodystructure = excluded.bodystructure,
+        thread_subject = excluded.thread_subject,
+        thread_references = excluded.thread_references,
+        in_reply_to = excluded.in_reply_to,
+        message_references = excluded.message_references,
+        sync_status = excluded.sync_status,
+        last_sync = excluded.last_sync
+"""
+
+UPSERT_BODY_SQL = """
+    INSERT INTO message_bodies (id, body_text, body_html)
+    SELECT id, ?, ? FROM messages WHERE account_id = ? AND folder = ? AND uid = ?
+    ON CONFLICT(id) DO UPDATE SET
+        body_text = COALESCE(excluded.body_text, message_bodies.body_text),
+        body_html = COALESCE(excluded.body_html, message_bodies.body_html)
+"""
+
+INSERT_ATTACHMENT_SQL = """
+    INSERT INTO attachments (
+        message_uid, folder, account_id, filename, content_type,
+        size, part_id, is_inline, content_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(account_id, folder, message_uid, filename) DO UPDATE SET
+        content_type = excluded.content_type,
+        size = excluded.size,
+        part_id = excluded.part_id,
+        is_inline = excluded.is_inline,
+        content_id = excluded.content_id
+"""
+
+DELETE_STALE_ATTACHMENTS_SQL = """
+    DELETE FROM attachments
+    WHERE account_id = ? AND folder = ? AND message_uid = ?
+    AND filename NOT IN (SELECT value FROM json_each(?))
+"""
+
+SUMMARY_COLUMNS = """
+    uid, folder, account_id, message_id, subject, sender_name, sender_email,
+    date_sent, date_epoch, is_read, is_flagged, is_answered, has_attachments,
+    thread_subject, in_reply_to, thread_id
+"""
+
+class DatabaseConnectionPool:
+    """Reusable per-thread read-only SQLite connections tuned for concurrent access"""
+
+    WRITER_PRAGMAS = (
+        "PRAGMA auto_vacuum=INCREMENTAL",
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+    )
+
+    PRAGMAS = (
+        "PRAGMA cache_size=-16000",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        """Get the connection owned by the calling thread, opening it on first use"""
+        thread = threading.current_thread()
+        conn = self._connections.get(thread)
+        if conn is None:
+            conn = self.open_connection()
+            with self._lock:
+                self._release_dead_threads()
+                self._connections[thread] = conn
+        return conn
+
+    def open_connection(self, readonly: bool = True) -> sqlite3.Connection:
+        """Open a new tuned connection, read-only unless it is the writer's"""
+        logging.debug(
+            f"DatabaseConnectionPool: Opening {'read-only' if readonly else 'writable'} connection to {self.db_path} for thread {threading.current_thread().name}"
+        )
+        if readonly:
+            uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS if readonly else self.WRITER_PRAGMAS + self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _release_dead_threads(self):
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def close_all(self):
+        """Close every pooled connection"""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception as e:
+                    logging.warning(f"DatabaseConnectionPool: Error closing connection: {e}")
+            logging.debug(f"DatabaseConnectionPool: Closed {len(self._connections)} connections")
+            self._connections.clear()
 
 class EmailStorage:
     def __init__(self, db_path: Optional[str] = None):
@@ -22,8 +173,16 @@ class EmailStorage:
 
         self.db_path = db_path
         logging.debug(f"EmailStorage: Initializing with database path: {db_path}")
-        self._lock = threading.Lock()
+        self._pool = DatabaseConnectionPool(db_path)
+        self.raw_store = RawMessageStore(self.get_cache_dir() / "raw")
+        self.record_cache = MessageRecordCache()
         self._init_database()
+        self._writer = StorageWriter(
+            lambda: self._pool.open_connection(readonly=False),
+            before_commit=refresh_queued_threads,
+        )
+        self._flags = FlagBuffer(self._writer.submit)
+        self._compactor = StorageCompactor(self)
 
     @staticmethod
     def get_cache_dir() -> Path:
@@ -39,144 +198,36 @@ class EmailStorage:
         config_dir.mkdir(parents=True, exist_ok=True)
         return config_dir
 
-    def get_connection(self):
-        """Get database connection"""
-        logging.debug(f"EmailStorage: Opening database connection to {self.db_path}")
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def get_connection(self) -> sqlite3.Connection:
+        """Get the calling thread's pooled read-only database connection"""
+        return self._pool.get()
 
-    def _init_database(self):
-        """Initialize database schema"""
-        logging.debug("EmailStorage: Initializing database schema")
-        with self.get_connection() as conn:
-            
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS messages (
-                    uid INTEGER PRIMARY KEY,
-                    folder TEXT NOT NULL,
-                    account_id TEXT NOT NULL,
-                    message_id TEXT,
-                    subject TEXT,
-                    sender_name TEXT,
-                    sender_email TEXT,
-                    recipients TEXT, -- JSON array
-                    cc TEXT, -- JSON array
-                    bcc TEXT, -- JSON array
-                    reply_to TEXT, -- JSON array
-                    date_sent TIMESTAMP,
-                    date_received TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    flags TEXT, -- JSON array
-                    is_read BOOLEAN DEFAULT 0,
-                    is_flagged BOOLEAN DEFAULT 0,
-                    is_deleted BOOLEAN DEFAULT 0,
-                    is_draft BOOLEAN DEFAULT 0,
-                    is_answered BOOLEAN DEFAULT 0,
-                    has_attachments BOOLEAN DEFAULT 0,
-                    body_text TEXT,
-                    body_html TEXT,
-                    headers TEXT, -- JSON object
-                    envelope TEXT, -- JSON object
-                    bodystructure TEXT, -- JSON object
-                    thread_subject TEXT,
-                    thread_references TEXT, -- JSON array
-                    in_reply_to TEXT,
-                    message_references TEXT,
-                    sync_status TEXT DEFAULT 'pending',
-                    last_sync TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(uid, folder, account_id)
-                )
-            """
-            )
+    def submit_write(self, job: WriteJob) -> Future:
+        """Queue a write job for the storage writer thread"""
+        return self._writer.submit(job)
 
-            
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS threads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject TEXT NOT NULL,
-                    folder TEXT NOT NULL,
-                    account_id TEXT NOT NULL,
-                    message_count INTEGER DEFAULT 0,
-                    unread_count INTEGER DEFAULT 0,
-                    has_attachments BOOLEAN DEFAULT 0,
-                    is_flagged BOOLEAN DEFAULT 0,
-                    participants TEXT, -- JSON object
-                    latest_date TIMESTAMP,
-                    earliest_date TIMESTAMP,
-                    latest_message_uid INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(subject, folder, account_id)
-                )
-            """
-            )
+    def _invalidate_records(self, account_id: str, folder: str, uids, future: Optional[Future] = None):
+        keys = [MessageRecordCache.key(account_id, folder, uid) for uid in uids if uid is not None]
+        self.record_cache.invalidate_many(keys)
 
-            
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS attachments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message_uid INTEGER NOT NULL,
-                    folder TEXT NOT NULL,
-                    account_id TEXT NOT NULL,
-                    filename TEXT NOT NULL,
-                    content_type TEXT,
-                    size INTEGER,
-                    part_id TEXT,
-                    is_inline BOOLEAN DEFAULT 0,
-                    content_id TEXT,
-                    downloaded BOOLEAN DEFAULT 0,
-                    file_path TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (message_uid) REFERENCES messages (uid)
-                )
-            """
-            )
+    def _log_write_failure(self, description: str, future: Future):
+        error = future.exception()
+        if error is not None:
+            logging.error(f"EmailStorage: Error {description}: {error}")
 
-            
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS sync_status (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_id TEXT NOT NULL,
-                    folder TEXT NOT NULL,
-                    last_sync TIMESTAMP,
-                    last_uid INTEGER,
-                    total_messages INTEGER DEFAULT 0,
-                    sync_errors INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'idle',
-                    UNIQUE(account_id, folder)
-                )
-            """
-            )
+    def close(self):
+        """Flush pending writes and close all database connections - call this on app shutdown"""
+        logging.debug("EmailStorage: Closing database connections")
+        self._flags.close()
+        self._compactor.stop()
+        self._pool.close_all()
+        self._writer.stop()
 
-            
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_messages_folder_account ON messages(folder, account_id)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_messages_date ON messages(date_sent)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages(thread_subject, folder, account_id)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_messages_flags ON messages(is_read, is_flagged)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_messages_search ON messages(subject, sender_name, sender_email)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_threads_folder_account ON threads(folder, account_id)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_threads_date ON threads(latest_date)"
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_attachments_message ON attachments(message_uid)"
-            )
+    def _init_database(self):
+        """Initialize database schema"""
+        logging.debug("EmailStorage: Initializing database schema")
+        with closing(self._pool.open_connection(readonly=False)) as conn:
+            run_migrations(conn)
 
             logging.debug("EmailStorage: Database schema initialization complete")
 
@@ -190,19 +241,73 @@ class EmailStorage:
         
         pass
 
-    def store_messages(self, messages: List, folder: str, account_id: str):
-        """Store multiple messages"""
+    def store_messages(self, messages: List, folder: str, account_id: str) -> Dict:
+        """Store a batch of messages and their attachments in a single transaction"""
         logging.debug(
             f"EmailStorage: Storing {len(messages)} messages for folder '{folder}', account_id '{account_id}'"
         )
-        with self._lock:
-            for i, message in enumerate(messages):
-                logging.debug(f"EmailStorage: Storing message {i+1}/{len(messages)}")
-                self.store_message(message, folder, account_id)
+        started = time.perf_counter()
+        message_rows = []
+        body_rows = []
+        attachment_rows = []
+        stale_attachment_rows = []
+        address_entries = {}
+        for message in messages:
+            row, (body_text, body_html), attachments = self._message_to_row(message, folder, account_id)
+            message_rows.append(row)
+            uid = row[0]
+            if uid is not None:
+                address_entries[uid] = extract_message_addresses(message)
+            if uid is not None and (body_text or body_html):
+                body_rows.append(self._body_to_row(uid, folder, account_id, body_text, body_html))
+            if uid is not None and attachments:
+                rows = [
+                    self._attachment_to_row(attachment, uid, folder, account_id)
+                    for attachment in attachments
+                ]
+                stale_attachment_rows.append(
+                    (account_id, folder, uid, json.dumps([row[3] for row in rows]))
+                )
+                attachment_rows.extend(rows)
+
+        uids = [row[0] for row in message_rows if row[0] is not None]
+
+        def write(conn: sqlite3.Connection):
+            unindex_messages(conn, message_ids(conn, account_id, folder, uids))
+            conn.executemany(INSERT_MESSAGE_SQL, message_rows)
+            conn.executemany(UPSERT_BODY_SQL, body_rows)
+            index_messages(conn, message_ids(conn, account_id, folder, uids))
+            assign_thread_ids(conn, account_id, folder, uids)
+            index_message_addresses(conn, account_id, folder, address_entries)
+            conn.executemany(DELETE_STALE_ATTACHMENTS_SQL, stale_attachment_rows)
+            conn.executemany(INSERT_ATTACHMENT_SQL, attachment_rows)
+
+        try:
+            self._writer.execute(write)
+        except Exception as e:
+            logging.error(
+                f"EmailStorage: Error storing batch of {len(message_rows)} messages for folder '{folder}': {e}"
+            )
+            raise
+        finally:
+            self._invalidate_records(account_id, folder, [row[0] for row in message_rows])
 
-    def store_message(self, message, folder: str, account_id: str):
+        stats = {
+            "messages": len(message_rows),
+            "attachments": len(attachment_rows),
+            "elapsed": time.perf_counter() - started,
+        }
+        logging.info(
+            f"EmailStorage: Stored {stats['messages']} messages and {stats['attachments']} attachments for folder '{folder}' in {stats['elapsed'] * 1000:.1f} ms"
+        )
+        return stats
+
+    def store_message(self, message, folder: str, account_id: str) -> Dict:
         """Store a single message"""
-        
+        return self.store_messages([message], folder, account_id)
+
+    def _message_to_row(self, message, folder: str, account_id: str) -> Tuple[tuple, Tuple, List]:
+        """Convert a message dict or Message object into a messages row, its body and its attachments"""
         if isinstance(message, dict):
             uid = message.get("uid")
             message_id = message.get("message_id", "")
@@ -217,6 +322,7 @@ class EmailStorage:
             date_sent = message.get("date", "")
             if date_sent is None:
                 date_sent = ""
+            date_epoch = parse_date_epoch(date_sent)
             flags = message.get("flags", [])
             is_read = message.get("is_read", False)
             is_flagged = message.get("is_flagged", False)
@@ -235,7 +341,6 @@ class EmailStorage:
             references = message.get("references", "")
             attachments = message.get("attachments", [])
         else:
-            
             uid = message.uid
             message_id = message.message_id
             subject = message.subject
@@ -246,6 +351,7 @@ class EmailStorage:
             bcc = message.bcc
             reply_to = message.reply_to
             date_sent = message.date
+            date_epoch = parse_date_epoch(date_sent)
             if date_sent is not None:
                 date_sent = (
                     date_sent.isoformat()
@@ -272,118 +378,98 @@ class EmailStorage:
             references = message.references
             attachments = message.attachments
 
-        logging.debug(f"EmailStorage: Storing message uid={uid} for folder '{folder}'")
-        try:
-            with self.get_connection() as conn:
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO messages (
-                        uid, folder, account_id, message_id, subject,
-                        sender_name, sender_email, recipients, cc, bcc, reply_to,
-                        date_sent, flags, is_read, is_flagged, is_deleted, is_draft, is_answered,
-                        has_attachments, body_text, body_html, headers, envelope, bodystructure,
-                        thread_subject, thread_references, in_reply_to, message_references,
-                        sync_status, last_sync
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        uid,
-                        folder,
-                        account_id,
-                        message_id,
-                        subject,
-                        sender_name,
-                        sender_email,
-                        json.dumps(recipients),
-                        json.dumps(cc),
-                        json.dumps(bcc),
-                        json.dumps(reply_to),
-                        date_sent,
-                        json.dumps(flags),
-                        is_read,
-                        is_flagged,
-                        is_deleted,
-                        is_draft,
-                        is_answered,
-                        has_attachments,
-                        body_text,
-                        body_html,
-                        json.dumps(headers),
-                        json.dumps(envelope),
-                        json.dumps(bodystructure),
-                        thread_subject,
-                        json.dumps(thread_references),
-                        in_reply_to,
-                        references,
-                        "synced",
-                        datetime.now(),
-                    ),
-                )
+        row = (
+            uid,
+            folder,
+            account_id,
+            message_id,
+            subject,
+            sender_name,
+            sender_email,
+            json.dumps(recipients),
+            json.dumps(cc),
+            json.dumps(bcc),
+            json.dumps(reply_to),
+            date_sent,
+            date_epoch,
+            json.dumps(flags),
+            is_read,
+            is_flagged,
+            is_deleted,
+            is_draft,
+            is_answered,
+            has_attachments,
+            json.dumps(headers),
+            json.dumps(envelope),
+            json.dumps(bodystructure),
+            thread_subject,
+            json.dumps(thread_references),
+            in_reply_to,
+            references,
+            "synced",
+            datetime.now(),
+        )
+        return row, (body_text, body_html), attachments
 
-                
-                if uid is not None:
-                    for attachment in attachments:
-                        if isinstance(attachment, dict):
-                            self.store_attachment_dict(
-                                attachment, uid, folder, account_id
-                            )
-                        else:
-                            self.store_attachment(attachment, uid, folder, account_id)
-
-                logging.debug(f"EmailStorage: Successfully stored message uid={uid}")
-        except Exception as e:
-            logging.error(f"EmailStorage: Error storing message uid={uid}: {e}")
-            raise
+    @staticmethod
+    def _body_to_row(
+        uid: int, folder: str, account_id: str, body_text: Optional[str], body_html: Optional[str]
+    ) -> tuple:
+        """Build the compressed body row for a message body"""
+        return (compress_body(body_text), compress_body(body_html), account_id, folder, uid)
+
+    def _load_body(self, conn: sqlite3.Connection, message_rowid: int) -> Dict:
+        """Load and decompress the body of a single message"""
+        row = conn.execute(
+            "SELECT body_text, body_html FROM message_bodies WHERE id = ?",
+            (message_rowid,),
+        ).fetchone()
+        if not row:
+            return {"body": "", "body_html": ""}
+        return {
+            "body": decompress_body(row["body_text"]),
+            "body_html": decompress_body(row["body_html"]),
+        }
+
+    def _attachment_to_row(self, attachment, message_uid: int, folder: str, account_id: str) -> tuple:
+        """Convert an attachment dict or Attachment object into an attachments row"""
+        if isinstance(attachment, dict):
+            return (
+                message_uid,
+                folder,
+                account_id,
+                attachment.get("filename", ""),
+                attachment.get("content_type", ""),
+                attachment.get("size", 0),
+                attachment.get("part_id", ""),
+                attachment.get("is_inline", False),
+                attachment.get("content_id", ""),
+            )
+        return (
+            message_uid,
+            folder,
+            account_id,
+            attachment.filename,
+            attachment.content_type,
+            attachment.size,
+            attachment.part_id,
+            attachment.is_inline,
+            attachment.content_id,
+        )
 
     def store_attachment(
         self, attachment, message_uid: int, folder: str, account_id: str
     ):
         """Store attachment information"""
-        with self.get_connection() as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO attachments (
-                    message_uid, folder, account_id, filename, content_type,
-                    size, part_id, is_inline, content_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    message_uid,
-                    folder,
-                    account_id,
-                    attachment.filename,
-                    attachment.content_type,
-                    attachment.size,
-                    attachment.part_id,
-                    attachment.is_inline,
-                    attachment.content_id,
-                ),
-            )
+        row = self._attachment_to_row(attachment, message_uid, folder, account_id)
+        self._writer.execute(lambda conn: conn.execute(INSERT_ATTACHMENT_SQL, row))
+        self._invalidate_records(account_id, folder, [message_uid])
 
     def store_attachment_dict(
         self, attachment_dict, message_uid: int, folder: str, account_id: str
     ):
         """Store attachment information from dictionary"""
-        with self.get_connection() as conn:
-            conn.execute(
-                """
-                INSERT OR REPLACE INTO attachments (
-                    message_uid, folder, account_id, filename, content_type,
-                    size, part_id, is_inline, content_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    message_uid,
-                    folder,
-                    account_id,
-                    attachment_dict.get("filename", ""),
-                    attachment_dict.get("content_type", ""),
-                    attachment_dict.get("size", 0),
-                    attachment_dict.get("part_id", ""),
-                    attachment_dict.get("is_inline", False),
-                    attachment_dict.get("content_id", ""),
-                ),
-            )
+        self.store_attachment(attachment_dict, message_uid, folder, account_id)
 
     def get_messages(
         self,
@@ -411,7 +497,7 @@ class EmailStorage:
                     """
                     SELECT * FROM messages
                     WHERE folder = ? AND account_id = ? AND is_deleted = 0
-                    ORDER BY date_sent DESC
+                    ORDER BY date_epoch DESC, uid DESC
                     LIMIT ? OFFSET ?
                 """,
                     (folder, account_id, limit, offset),
@@ -420,15 +506,7 @@ class EmailStorage:
                 rows = cursor.fetchall()
                 logging.debug(f"EmailStorage: Query returned {len(rows)} rows")
 
-                messages = []
-                for i, row in enumerate(rows):
-                    logging.debug(f"EmailStorage: Processing message {i+1}/{len(rows)}")
-                    message_data = self._row_to_message(row)
-                    
-                    message_data["attachments"] = self.get_message_attachments(
-                        row["uid"], folder, account_id
-                    )
-                    messages.append(message_data)
+                messages = self._rows_to_messages(conn, rows, folder, account_id)
 
                 logging.info(
                     f"EmailStorage: Successfully retrieved {len(messages)} messages for folder '{folder}'"
@@ -443,43 +521,361 @@ class EmailStorage:
             )
             raise
 
-    def _row_to_message(self, row: sqlite3.Row) -> Dict:
-        """Convert database row to message dictionary"""
-        logging.debug(f"EmailStorage: Converting row to message for uid={row['uid']}")
+    def get_message_summaries(
+        self,
+        folder: str,
+        account_id: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """Get lightweight message summaries for list views, without bodies or JSON columns"""
+        logging.debug(
+            f"EmailStorage: Getting message summaries for folder='{folder}', account_id='{account_id}', limit={limit}, offset={offset}"
+        )
+
+        if account_id is None:
+            logging.warning("EmailStorage: account_id is None, returning empty list")
+            return []
+
+        cursor = self.get_connection().execute(
+            f"""
+            SELECT {SUMMARY_COLUMNS} FROM messages
+            WHERE folder = ? AND account_id = ? AND is_deleted = 0
+            ORDER BY date_epoch DESC, uid DESC
+            LIMIT ? OFFSET ?
+        """,
+            (folder, account_id, limit, offset),
+        )
+        summaries = [self._row_to_summary(row) for row in cursor]
+        logging.debug(
+            f"EmailStorage: Retrieved {len(summaries)} message summaries for folder '{folder}'"
+        )
+        return summaries
+
+    def get_message_uids(self, folder: str, account_id: str) -> set:
+        """Get the UIDs of every stored message in a folder"""
+        cursor = self.get_connection().execute(
+            "SELECT uid FROM messages WHERE account_id = ? AND folder = ?",
+            (account_id, folder),
+        )
+        return {row[0] for row in cursor}
+
+    def get_lowest_uid(self, folder: str, account_id: str) -> Optional[int]:
+        """Get the smallest stored UID of a folder, None when it has no stored messages"""
+        return self.get_connection().execute(
+            "SELECT MIN(uid) FROM messages WHERE account_id = ? AND folder = ?",
+            (account_id, folder),
+        ).fetchone()[0]
+
+    def get_message_flag_states(self, folder: str, account_id: str, uids: Iterable[int]) -> Dict[int, Dict]:
+        """Get the stored IMAP flags and the state columns derived from them of messages by UID"""
+        cursor = self.get_connection().execute(
+            """
+            SELECT uid, flags, is_read, is_flagged, is_answered, is_deleted, is_draft FROM messages
+            WHERE account_id = ? AND folder = ? AND uid IN (SELECT value FROM json_each(?))
+        """,
+            (account_id, folder, json.dumps(list(uids))),
+        )
         return {
+            row["uid"]: {
+                "flags": sorted(json.loads(row["flags"] or "[]")),
+                "is_read": bool(row["is_read"]),
+                "is_flagged": bool(row["is_flagged"]),
+                "is_answered": bool(row["is_answered"]),
+                "is_deleted": bool(row["is_deleted"]),
+                "is_draft": bool(row["is_draft"]),
+            }
+            for row in cursor
+        }
+
+    def get_message_page(
+        self,
+        folder: str,
+        account_id: Optional[str] = None,
+        limit: int = 50,
+        page_token: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get a page of message summaries after page_token, plus the token for the next page"""
+        logging.debug(
+            f"EmailStorage: Getting message page for folder='{folder}', account_id='{account_id}', limit={limit}, page_token={page_token}"
+        )
+
+        if account_id is None:
+            logging.warning("EmailStorage: account_id is None, returning empty page")
+            return [], None
+
+        if page_token:
+            sort_key, uid = self._decode_page_token(page_token)
+            cursor = self.get_connection().execute(
+                f"""
+                SELECT {SUMMARY_COLUMNS} FROM messages
+                WHERE account_id = ? AND folder = ? AND is_deleted = 0
+                AND (date_epoch, uid) < (?, ?)
+                ORDER BY date_epoch DESC, uid DESC
+                LIMIT ?
+            """,
+                (account_id, folder, sort_key, uid, limit),
+            )
+        else:
+            cursor = self.get_connection().execute(
+                f"""
+                SELECT {SUMMARY_COLUMNS} FROM messages
+                WHERE account_id = ? AND folder = ? AND is_deleted = 0
+                ORDER BY date_epoch DESC, uid DESC
+                LIMIT ?
+            """,
+                (account_id, folder, limit),
+            )
+
+        rows = cursor.fetchall()
+        next_token = None
+        if len(rows) == limit:
+            next_token = self._encode_page_token(rows[-1]["date_epoch"], rows[-1]["uid"])
+
+        logging.debug(
+            f"EmailStorage: Retrieved page of {len(rows)} summaries for folder '{folder}', has_more={next_token is not None}"
+        )
+        return [self._row_to_summary(row) for row in rows], next_token
+
+    def get_messages_through(self, folder: str, account_id: str, page_token: str) -> List[Dict]:
+        """Get message summaries from the newest down to and including the row page_token points at"""
+        sort_key, uid = self._decode_page_token(page_token)
+        cursor = self.get_connection().execute(
+            f"""
+            SELECT {SUMMARY_COLUMNS} FROM messages
+            WHERE account_id = ? AND folder = ? AND is_deleted = 0
+            AND (date_epoch, uid) >= (?, ?)
+            ORDER BY date_epoch DESC, uid DESC
+        """,
+            (account_id, folder, sort_key, uid),
+        )
+        return [self._row_to_summary(row) for row in cursor]
+
+    @staticmethod
+    def _encode_page_token(sort_key, uid: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([sort_key, uid]).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_page_token(page_token: str) -> Tuple:
+        sort_key, uid = json.loads(base64.urlsafe_b64decode(page_token.encode("ascii")))
+        return sort_key, uid
+
+    def _row_to_summary(self, row: sqlite3.Row) -> Dict:
+        """Convert a summary row to a message summary dictionary"""
+        return self._apply_pending_flags({
             "uid": row["uid"],
             "folder": row["folder"],
             "account_id": row["account_id"],
             "message_id": row["message_id"],
             "subject": row["subject"],
             "sender": {"name": row["sender_name"], "email": row["sender_email"]},
-            "recipients": json.loads(row["recipients"] or "[]"),
-            "cc": json.loads(row["cc"] or "[]"),
-            "bcc": json.loads(row["bcc"] or "[]"),
-            "reply_to": json.loads(row["reply_to"] or "[]"),
             "date": row["date_sent"],
-            "flags": json.loads(row["flags"] or "[]"),
             "is_read": bool(row["is_read"]),
             "is_flagged": bool(row["is_flagged"]),
-            "is_deleted": bool(row["is_deleted"]),
-            "is_draft": bool(row["is_draft"]),
             "is_answered": bool(row["is_answered"]),
             "has_attachments": bool(row["has_attachments"]),
-            "body": row["body_text"],
-            "body_html": row["body_html"],
-            "headers": json.loads(row["headers"] or "{}"),
-            "envelope": json.loads(row["envelope"] or "{}"),
-            "bodystructure": json.loads(row["bodystructure"] or "{}"),
             "thread_subject": row["thread_subject"],
-            "thread_references": json.loads(row["thread_references"] or "[]"),
             "in_reply_to": row["in_reply_to"],
-            "references": row["message_references"],
+            "thread_id": row["thread_id"],
+        })
+
+    def _apply_pending_flags(self, record: Dict) -> Dict:
+        """Overlay buffered read, flagged and answered changes on a record"""
+        return self._flags.apply(
+            FlagBuffer.key(record["account_id"], record["folder"], record["uid"]), record
+        )
+
+    def _row_to_message(self, row: sqlite3.Row) -> Dict:
+        """Convert database row to a message record decoding JSON columns on first access"""
+        return self._apply_pending_flags(LazyMessageRecord.from_row(
+            row,
+            {
+                "uid": row["uid"],
+                "folder": row["folder"],
+                "account_id": row["account_id"],
+                "message_id": row["message_id"],
+                "subject": row["subject"],
+                "sender": {"name": row["sender_name"], "email": row["sender_email"]},
+                "date": row["date_sent"],
+                "is_read": bool(row["is_read"]),
+                "is_flagged": bool(row["is_flagged"]),
+                "is_deleted": bool(row["is_deleted"]),
+                "is_draft": bool(row["is_draft"]),
+                "is_answered": bool(row["is_answered"]),
+                "has_attachments": bool(row["has_attachments"]),
+                "body": "",
+                "body_html": "",
+                "thread_subject": row["thread_subject"],
+                "in_reply_to": row["in_reply_to"],
+                "references": row["message_references"],
+                "thread_id": row["thread_id"],
+            },
+        ))
+
+    def get_folder_stats(self, account_id: str) -> Dict[str, Dict[str, int]]:
+        """Get total and unread counts for every folder of an account"""
+        cursor = self.get_connection().execute(
+            "SELECT folder, total_count, unread_count FROM folder_stats WHERE account_id = ?",
+            (account_id,),
+        )
+        return {
+            row["folder"]: {"total": row["total_count"], "unread": row["unread_count"]}
+            for row in cursor
+        }
+
+    def search_addresses(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Autocomplete addresses whose email or name starts with prefix, most used first"""
+        prefix = (prefix or "").strip()
+        if not prefix:
+            return []
+
+        pattern = re.sub(r"([\\%_])", r"\\\1", prefix) + "%"
+        rows = self.get_connection().execute(
+            """
+            SELECT id, email, name,
+                (SELECT COUNT(*) FROM message_addresses WHERE address_id = matches.id) AS message_count
+            FROM (
+                SELECT id, email, name FROM addresses WHERE email LIKE ? ESCAPE '\\'
+                UNION
+                SELECT id, email, name FROM addresses WHERE name LIKE ? ESCAPE '\\'
+            ) AS matches
+            ORDER BY message_count DESC, email
+            LIMIT ?
+        """,
+            (pattern, pattern, limit),
+        ).fetchall()
+        return [self._row_to_address(row) for row in rows]
+
+    def get_top_correspondents(self, account_id: str, limit: int = 20) -> List[Dict]:
+        """Get the addresses sharing the most messages with an account, excluding its own"""
+        rows = self.get_connection().execute(
+            """
+            SELECT addresses.id, addresses.email, addresses.name,
+                COUNT(DISTINCT messages.id) AS message_count,
+                MAX(messages.date_epoch) AS latest_epoch
+            FROM messages
+            JOIN message_addresses ON message_addresses.message_id = messages.id
+            JOIN addresses ON addresses.id = message_addresses.address_id
+            WHERE messages.account_id = ? AND messages.is_deleted = 0 AND addresses.email != ?
+            GROUP BY addresses.id
+            ORDER BY message_count DESC, latest_epoch DESC
+            LIMIT ?
+        """,
+            (account_id, account_id, limit),
+        ).fetchall()
+        return [self._row_to_address(row) for row in rows]
+
+    def get_messages_with_address(
+        self, email_address: str, account_id: str, limit: int = 50, offset: int = 0
+    ) -> List[Dict]:
+        """Get an account's messages from or to an address across folders, newest first"""
+        conn = self.get_connection()
+        rows = conn.execute(
+            """
+            SELECT * FROM messages
+            WHERE id IN (
+                SELECT message_addresses.message_id FROM message_addresses
+                JOIN addresses ON addresses.id = message_addresses.address_id
+                WHERE addresses.email = ?
+            )
+            AND account_id = ? AND is_deleted = 0
+            ORDER BY date_epoch DESC, uid DESC
+            LIMIT ? OFFSET ?
+        """,
+            (email_address.strip().lower(), account_id, limit, offset),
+        ).fetchall()
+
+        rows_by_folder: Dict[str, List[sqlite3.Row]] = {}
+        for row in rows:
+            rows_by_folder.setdefault(row["folder"], []).append(row)
+        messages = {}
+        for folder, folder_rows in rows_by_folder.items():
+            for message in self._rows_to_messages(conn, folder_rows, folder, account_id):
+                messages[(folder, message["uid"])] = message
+        return [messages[(row["folder"], row["uid"])] for row in rows]
+
+    def get_thread_participants(self, thread_id: int) -> List[Dict]:
+        """Get the distinct addresses taking part in a thread"""
+        rows = self.get_connection().execute(
+            """
+            SELECT addresses.id, addresses.email, addresses.name,
+                COUNT(DISTINCT messages.id) AS message_count
+            FROM messages
+            JOIN message_addresses ON message_addresses.message_id = messages.id
+            JOIN addresses ON addresses.id = message_addresses.address_id
+            WHERE messages.thread_id = ? AND messages.is_deleted = 0
+            GROUP BY addresses.id
+            ORDER BY message_count DESC, addresses.email
+        """,
+            (thread_id,),
+        ).fetchall()
+        return [self._row_to_address(row) for row in rows]
+
+    def _row_to_address(self, row: sqlite3.Row) -> Dict:
+        """Convert an address row to an address dictionary"""
+        address = {
+            "id": row["id"],
+            "email": row["email"],
+            "name": row["name"] or "",
+            "message_count": row["message_count"],
+        }
+        if "latest_epoch" in row.keys():
+            address["latest_epoch"] = row["latest_epoch"]
+        return address
+
+    def get_threads(
+        self,
+        folder: str,
+        account_id: str,
+        thread_ids: Optional[List[int]] = None,
+        limit: int = -1,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """Get materialized threads of a folder, most recent activity first"""
+        params = [account_id, folder]
+        id_filter = ""
+        if thread_ids is not None:
+            id_filter = "AND id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(thread_ids)))
+        cursor = self.get_connection().execute(
+            f"""
+            SELECT * FROM threads
+            WHERE account_id = ? AND folder = ? AND message_count > 0 {id_filter}
+            ORDER BY latest_epoch DESC, id DESC
+            LIMIT ? OFFSET ?
+        """,
+            (*params, limit, offset),
+        )
+        threads = [self._row_to_thread(row) for row in cursor]
+        logging.debug(f"EmailStorage: Retrieved {len(threads)} threads for folder '{folder}'")
+        return threads
+
+    def _row_to_thread(self, row: sqlite3.Row) -> Dict:
+        """Convert a threads row to a thread dictionary"""
+        return {
+            "id": row["id"],
+            "subject": row["subject"],
+            "message_count": row["message_count"],
+            "unread_count": row["unread_count"],
+            "has_attachments": bool(row["has_attachments"]),
+            "is_flagged": bool(row["is_flagged"]),
+            "participants": json.loads(row["participants"] or "{}"),
+            "latest_date": row["latest_date"],
+            "latest_epoch": row["latest_epoch"],
+            "earliest_epoch": row["earliest_epoch"],
+            "latest_message_uid": row["latest_message_uid"],
         }
 
     def get_message_by_uid(self, uid: int, folder: str, account_id: str) -> Optional[Dict]:
         """Get a single message by UID from storage"""
         logging.debug(f"EmailStorage: Getting message by UID {uid} for folder='{folder}', account_id='{account_id}'")
-        
+        cache_key = MessageRecordCache.key(account_id, folder, uid)
+        cached = self.record_cache.get(cache_key)
+        if cached is not None:
+            logging.debug(f"EmailStorage: Message UID {uid} served from record cache")
+            return self._apply_pending_flags(cached)
+
+        generation = self.record_cache.generation()
         try:
             with self.get_connection() as conn:
                 cursor = conn.execute(
@@ -492,8 +888,9 @@ class EmailStorage:
                 
                 row = cursor.fetchone()
                 if row:
-                    message_data = self._row_to_message(row)
-                    message_data["attachments"] = self.get_message_attachments(uid, folder, account_id)
+                    message_data = self._rows_to_messages(conn, [row], folder, account_id)[0]
+                    message_data.update(self._load_body(conn, row["id"]))
+                    self.record_cache.put(cache_key, message_data, generation)
                     logging.debug(f"EmailStorage: Found message UID {uid}")
                     return message_data
                 else:
@@ -512,90 +909,166 @@ class EmailStorage:
             f"EmailStorage: Getting attachments for message uid={message_uid}"
         )
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute(
-                    """
-                    SELECT * FROM attachments
-                    WHERE message_uid = ? AND folder = ? AND account_id = ?
-                """,
-                    (message_uid, folder, account_id),
-                )
-
-                attachments = []
-                for row in cursor.fetchall():
-                    attachments.append(
-                        {
-                            "id": row["id"],
-                            "filename": row["filename"],
-                            "content_type": row["content_type"],
-                            "size": row["size"],
-                            "part_id": row["part_id"],
-                            "is_inline": bool(row["is_inline"]),
-                            "content_id": row["content_id"],
-                            "downloaded": bool(row["downloaded"]),
-                            "file_path": row["file_path"],
-                        }
-                    )
-
-                logging.debug(
-                    f"EmailStorage: Found {len(attachments)} attachments for message uid={message_uid}"
-                )
-                return attachments
+            attachments = self._fetch_attachments(
+                self.get_connection(), [message_uid], folder, account_id
+            ).get(message_uid, [])
+            logging.debug(
+                f"EmailStorage: Found {len(attachments)} attachments for message uid={message_uid}"
+            )
+            return attachments
         except Exception as e:
             logging.error(
                 f"EmailStorage: Error getting attachments for message uid={message_uid}: {e}"
             )
             return []
 
+    def _rows_to_messages(
+        self, conn: sqlite3.Connection, rows: List[sqlite3.Row], folder: str, account_id: str
+    ) -> List[Dict]:
+        """Convert a page of message rows, loading all their attachments with one query"""
+        attachments = self._fetch_attachments(
+            conn, [row["uid"] for row in rows], folder, account_id
+        )
+        messages = []
+        for row in rows:
+            message_data = self._row_to_message(row)
+            message_data["attachments"] = attachments.get(row["uid"], [])
+            messages.append(message_data)
+        return messages
+
+    def _fetch_attachments(
+        self, conn: sqlite3.Connection, message_uids: List[int], folder: str, account_id: str
+    ) -> Dict[int, List[Dict]]:
+        """Get attachments for a set of messages grouped by message UID"""
+        if not message_uids:
+            return {}
+
+        cursor = conn.execute(
+            """
+            SELECT * FROM attachments
+            WHERE folder = ? AND account_id = ?
+            AND message_uid IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        """,
+            (folder, account_id, json.dumps(message_uids)),
+        )
+
+        attachments: Dict[int, List[Dict]] = {}
+        for row in cursor:
+            attachments.setdefault(row["message_uid"], []).append(
+                {
+                    "id": row["id"],
+                    "filename": row["filename"],
+                    "content_type": row["content_type"],
+                    "size": row["size"],
+                    "part_id": row["part_id"],
+                    "is_inline": bool(row["is_inline"]),
+                    "content_id": row["content_id"],
+                    "downloaded": bool(row["downloaded"]),
+                    "file_path": row["file_path"],
+                }
+            )
+        return attachments
+
     def search_messages(
         self, query: str, folder: str, account_id: str, limit: int = 50
     ) -> List[Dict]:
-        """Search messages by query"""
-        with self.get_connection() as conn:
-            search_query = f"%{query}%"
-            cursor = conn.execute(
-                """
-                SELECT * FROM messages
-                WHERE folder = ? AND account_id = ? AND is_deleted = 0
-                AND (subject LIKE ? OR sender_name LIKE ? OR sender_email LIKE ? OR body_text LIKE ?)
-                ORDER BY date_sent DESC
-                LIMIT ?
-            """,
-                (
-                    folder,
-                    account_id,
-                    search_query,
-                    search_query,
-                    search_query,
-                    search_query,
-                    limit,
-                ),
-            )
+        """Search messages by query, best bm25 matches first"""
+        match_query = self._build_match_query(query)
+        if not match_query:
+            return []
 
-            messages = []
-            for row in cursor.fetchall():
-                message_data = self._row_to_message(row)
-                message_data["attachments"] = self.get_message_attachments(
-                    row["uid"], folder, account_id
-                )
-                messages.append(message_data)
+        conn = self.get_connection()
+        cursor = conn.execute(
+            """
+            SELECT messages.* FROM messages_fts
+            JOIN messages ON messages.id = messages_fts.rowid
+            WHERE messages_fts MATCH ?
+            AND messages.account_id = ? AND messages.folder = ? AND messages.is_deleted = 0
+            ORDER BY bm25(messages_fts, 10.0, 5.0, 1.0)
+            LIMIT ?
+        """,
+            (match_query, account_id, folder, limit),
+        )
+        return self._rows_to_messages(conn, cursor.fetchall(), folder, account_id)
 
-            return messages
+    @staticmethod
+    def _build_match_query(query: str) -> str:
+        """Turn free text into an FTS5 query matching every term as a prefix"""
+        terms = re.findall(r"\w+", query or "")
+        return " ".join(f'"{term}"*' for term in terms)
 
     def update_sync_status(
-        self, account_id: str, folder: str, status: str, last_uid: Optional[int] = None
+        self,
+        account_id: str,
+        folder: str,
+        status: str,
+        last_uid: Optional[int] = None,
+        uid_validity: Optional[int] = None,
+        uid_next: Optional[int] = None,
+        total_messages: Optional[int] = None,
+        highest_modseq: Optional[int] = None,
+        flag_updates: Optional[Dict[int, Dict]] = None,
     ):
-        """Update sync status for folder"""
-        with self.get_connection() as conn:
+        """Update sync status for folder, keeping stored values for fields passed as None, together with the server flag changes it covers"""
+        updated_at = datetime.now()
+        flag_rows = [
+            (
+                json.dumps(state["flags"]),
+                state["is_read"],
+                state["is_flagged"],
+                state["is_answered"],
+                state["is_deleted"],
+                state["is_draft"],
+                updated_at,
+                account_id,
+                folder,
+                uid,
+            )
+            for uid, state in (flag_updates or {}).items()
+        ]
+        row = (
+            account_id,
+            folder,
+            updated_at,
+            status,
+            last_uid,
+            uid_validity,
+            uid_next,
+            highest_modseq,
+            total_messages,
+        )
+        def write(conn: sqlite3.Connection):
+            conn.executemany(
+                """
+                UPDATE messages SET flags = ?, is_read = ?, is_flagged = ?, is_answered = ?,
+                    is_deleted = ?, is_draft = ?, last_sync = ?
+                WHERE account_id = ? AND folder = ? AND uid = ?
+            """,
+                flag_rows,
+            )
             conn.execute(
                 """
-                INSERT OR REPLACE INTO sync_status (
-                    account_id, folder, last_sync, last_uid, status
-                ) VALUES (?, ?, ?, ?, ?)
+                INSERT INTO sync_status (
+                    account_id, folder, last_sync, status, last_uid, uid_validity, uid_next,
+                    highest_modseq, total_messages
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, 0))
+                ON CONFLICT(account_id, folder) DO UPDATE SET
+                    last_sync = excluded.last_sync,
+                    status = excluded.status,
+                    last_uid = COALESCE(excluded.last_uid, sync_status.last_uid),
+                    uid_validity = COALESCE(excluded.uid_validity, sync_status.uid_validity),
+                    uid_next = COALESCE(excluded.uid_next, sync_status.uid_next),
+                    highest_modseq = COALESCE(excluded.highest_modseq, sync_status.highest_modseq),
+                    total_messages = COALESCE(?, sync_status.total_messages)
             """,
-                (account_id, folder, datetime.now(), last_uid, status),
+                row + (total_messages,),
             )
 
+        self._writer.execute(write)
+        if flag_updates:
+            self._invalidate_records(account_id, folder, flag_updates)
+
     def get_sync_status(self, account_id: str, folder: str) -> Optional[Dict]:
         """Get sync status for folder"""
         with self.get_connection() as conn:
@@ -614,79 +1087,225 @@ class EmailStorage:
                     "folder": row["folder"],
                     "last_sync": row["last_sync"],
                     "last_uid": row["last_uid"],
+                    "uid_validity": row["uid_validity"],
+                    "uid_next": row["uid_next"],
+                    "highest_modseq": row["highest_modseq"],
                     "total_messages": row["total_messages"],
                     "sync_errors": row["sync_errors"],
                     "status": row["status"],
                 }
             return None
 
-    def cleanup_old_messages(self, days_old: int = 30):
-        """Clean up old messages"""
-        cutoff_date = datetime.now() - timedelta(days=days_old)
+    CLEANUP_CHUNK_SIZE = 500
 
-        with self.get_connection() as conn:
-            
+    def cleanup_old_messages(self, days_old: int = 30) -> int:
+        """Delete unflagged messages dated before the cutoff, by storage time when their Date did not parse"""
+        cutoff_epoch = int((datetime.now() - timedelta(days=days_old)).timestamp())
+
+        def delete_chunk(conn: sqlite3.Connection) -> int:
+            ids = [
+                row[0]
+                for row in conn.execute(
+                    """
+                    SELECT id FROM messages
+                    WHERE is_flagged = 0 AND (
+                        CASE WHEN date_epoch > 0 THEN date_epoch
+                        ELSE CAST(strftime('%s', date_received) AS INTEGER) END
+                    ) < ?
+                    LIMIT ?
+                """,
+                    (cutoff_epoch, self.CLEANUP_CHUNK_SIZE),
+                )
+            ]
+            unindex_messages(conn, ids)
+            return conn.execute(
+                "DELETE FROM messages WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(ids),),
+            ).rowcount
+
+        def delete_orphaned_attachments(conn: sqlite3.Connection):
             conn.execute(
                 """
-                DELETE FROM messages
-                WHERE date_sent < ? AND is_flagged = 0
-            """,
-                (cutoff_date,),
+                DELETE FROM attachments
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM messages
+                    WHERE messages.account_id = attachments.account_id
+                    AND messages.folder = attachments.folder
+                    AND messages.uid = attachments.message_uid
+                )
+            """
             )
 
-            
+        deleted = 0
+        while True:
+            chunk = self._writer.execute(delete_chunk)
+            deleted += chunk
+            if chunk < self.CLEANUP_CHUNK_SIZE:
+                break
+
+        self._writer.execute(delete_orphaned_attachments)
+        self.record_cache.clear()
+        self.prune_raw_messages()
+        logging.info(f"EmailStorage: Cleaned up {deleted} messages older than {days_old} days")
+        self._compactor.wake()
+        return deleted
+
+    def delete_messages(self, uids, folder: str, account_id: str) -> int:
+        """Delete a set of messages and their attachments with one statement per table"""
+        uid_rows = [(uid,) for uid in set(uids)]
+        if not uid_rows:
+            return 0
+
+        def write(conn: sqlite3.Connection) -> int:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS delete_uids (uid INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM delete_uids")
+            conn.executemany("INSERT INTO delete_uids (uid) VALUES (?)", uid_rows)
+            unindex_messages(conn, message_ids(conn, account_id, folder, [uid for (uid,) in uid_rows]))
+            deleted = conn.execute(
+                """
+                DELETE FROM messages
+                WHERE account_id = ? AND folder = ? AND uid IN (SELECT uid FROM delete_uids)
+            """,
+                (account_id, folder),
+            ).rowcount
             conn.execute(
                 """
                 DELETE FROM attachments
-                WHERE message_uid NOT IN (SELECT uid FROM messages)
-            """
+                WHERE account_id = ? AND folder = ? AND message_uid IN (SELECT uid FROM delete_uids)
+            """,
+                (account_id, folder),
             )
+            conn.execute("DELETE FROM delete_uids")
+            return deleted
+
+        started = time.perf_counter()
+        deleted = self._writer.execute(write)
+        self._invalidate_records(account_id, folder, [uid for (uid,) in uid_rows])
+        logging.info(
+            f"EmailStorage: Deleted {deleted} messages from folder '{folder}' in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return deleted
+
+    def get_free_pages(self) -> int:
+        """Get the number of unused pages waiting to be reclaimed"""
+        return self.get_connection().execute("PRAGMA freelist_count").fetchone()[0]
 
-            
+    def is_write_idle(self) -> bool:
+        """Check whether no write jobs are waiting"""
+        return self._writer.is_idle()
+
+    def compact_step(self, max_pages: int) -> int:
+        """Reclaim up to max_pages free pages in one short statement run between write batches, returning the bytes reclaimed"""
+        def write(conn: sqlite3.Connection) -> int:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.executescript(f"PRAGMA incremental_vacuum({min(max_pages, free_before)})")
+            free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return (free_before - free_after) * page_size
+
+        return self._writer.submit(write, transaction=False).result()
+
+    def is_incremental_vacuum(self) -> bool:
+        """Check whether free pages can be reclaimed incrementally, asking the writer as readers keep the mode they opened with"""
+        return self._writer.submit(
+            lambda conn: conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2, transaction=False
+        ).result()
+
+    def enable_incremental_vacuum(self):
+        """Rebuild a database created without incremental auto-vacuum, a maintenance action blocking writes until it finishes"""
+        def rebuild(conn: sqlite3.Connection):
+            started = time.perf_counter()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
             conn.execute("VACUUM")
+            logging.info(
+                f"EmailStorage: Enabled incremental auto-vacuum in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
 
-    def update_message_body(self, uid: int, folder: str, account_id: str, body_text: str, body_html: str = None):
-        """Update message body in database"""
+        self._writer.submit(rebuild, transaction=False).result()
+
+    def compact(self) -> int:
+        """Reclaim free pages now in bounded steps, returning the bytes reclaimed"""
+        return self._compactor.compact()
+
+    def store_raw_message(self, uid: int, folder: str, account_id: str, raw: bytes) -> str:
+        """Cache a raw RFC822 message on disk and link it to its message row"""
+        digest = self.raw_store.put(raw)
+        self._writer.execute(
+            lambda conn: conn.execute(
+                "UPDATE messages SET raw_digest = ? WHERE uid = ? AND folder = ? AND account_id = ?",
+                (digest, uid, folder, account_id),
+            )
+        )
+        logging.debug(f"EmailStorage: Cached raw message for uid={uid} as {digest}")
+        return digest
+
+    def get_raw_message(self, uid: int, folder: str, account_id: str) -> Optional[bytes]:
+        """Read a cached raw RFC822 message, None when it was never downloaded"""
+        row = self.get_connection().execute(
+            "SELECT raw_digest FROM messages WHERE uid = ? AND folder = ? AND account_id = ?",
+            (uid, folder, account_id),
+        ).fetchone()
+        if not row or not row["raw_digest"]:
+            return None
+        return self.raw_store.read(row["raw_digest"])
+
+    def prune_raw_messages(self) -> int:
+        """Remove cached raw messages no longer referenced by any message"""
+        rows = self.get_connection().execute(
+            "SELECT DISTINCT raw_digest FROM messages WHERE raw_digest IS NOT NULL"
+        ).fetchall()
+        return self.raw_store.prune(row["raw_digest"] for row in rows)
+
+    def update_message_body(self, uid: int, folder: str, account_id: str, body_text: str, body_html: str = None) -> Future:
+        """Queue a message body update, resolved once it is committed"""
         logging.debug(f"EmailStorage: Updating message body for uid={uid}")
-        try:
-            with self.get_connection() as conn:
-                if body_html is not None:
-                    conn.execute(
-                        """
-                        UPDATE messages
-                        SET body_text = ?, body_html = ?
-                        WHERE uid = ? AND folder = ? AND account_id = ?
-                    """,
-                        (body_text, body_html, uid, folder, account_id),
-                    )
-                else:
-                    conn.execute(
-                        """
-                        UPDATE messages
-                        SET body_text = ?
-                        WHERE uid = ? AND folder = ? AND account_id = ?
-                    """,
-                        (body_text, uid, folder, account_id),
-                    )
-                logging.debug(f"EmailStorage: Successfully updated message body for uid={uid}")
-        except Exception as e:
-            logging.error(f"EmailStorage: Error updating message body for uid={uid}: {e}")
-            raise
+        body_row = self._body_to_row(uid, folder, account_id, body_text, body_html)
 
-    def update_message_read_status(self, uid: int, folder: str, account_id: str, is_read: bool):
-        """Update message read status in database"""
-        logging.debug(f"EmailStorage: Updating read status for UID {uid} to {is_read}")
-        with self.get_connection() as conn:
-            cursor = conn.execute(
-                """
-                UPDATE messages 
-                SET is_read = ?, last_sync = ?
-                WHERE uid = ? AND folder = ? AND account_id = ?
-                """,
-                (is_read, datetime.now(), uid, folder, account_id),
+        def write(conn: sqlite3.Connection):
+            ids = message_ids(conn, account_id, folder, [uid])
+            unindex_messages(conn, ids)
+            conn.execute(UPSERT_BODY_SQL, body_row)
+            index_messages(conn, ids)
+            logging.debug(f"EmailStorage: Successfully updated message body for uid={uid}")
+
+        future = self._writer.submit(write)
+        future.add_done_callback(partial(self._invalidate_records, account_id, folder, [uid]))
+        future.add_done_callback(
+            partial(self._log_write_failure, f"updating message body for uid={uid}")
+        )
+        return future
+
+    def update_message_read_status(self, uid: int, folder: str, account_id: str, is_read: bool) -> Future:
+        """Buffer a read status update, resolved once its batch is committed"""
+        return self.update_message_flags(uid, folder, account_id, is_read=is_read)
+
+    def update_message_flags(
+        self,
+        uid: int,
+        folder: str,
+        account_id: str,
+        is_read: Optional[bool] = None,
+        is_flagged: Optional[bool] = None,
+        is_answered: Optional[bool] = None,
+    ) -> Future:
+        """Buffer read, flagged and answered changes, written together on a short timer"""
+        changes = {
+            field: value
+            for field, value in (
+                ("is_read", is_read),
+                ("is_flagged", is_flagged),
+                ("is_answered", is_answered),
             )
-            
-            if cursor.rowcount > 0:
-                logging.debug(f"EmailStorage: Successfully updated read status for UID {uid}")
-            else:
-                logging.warning(f"EmailStorage: No message found to update for UID {uid}")
+            if value is not None
+        }
+        logging.debug(f"EmailStorage: Buffering flag changes {changes} for UID {uid}")
+        future = self._flags.update(FlagBuffer.key(account_id, folder, uid), changes)
+        future.add_done_callback(partial(self._invalidate_records, account_id, folder, [uid]))
+        future.add_done_callback(
+            partial(self._log_write_failure, f"updating flags for UID {uid}")
+        )
+        return future
+
+    def flush_flag_changes(self) -> Optional[Future]:
+        """Write buffered flag changes now instead of waiting for the timer"""
+        return self._flags.flush()
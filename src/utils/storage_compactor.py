@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+
+class StorageCompactor:
+    """Background task reclaiming free database pages in small steps while the writer is idle"""
+
+    STEP_PAGES = 256
+    MIN_FREE_PAGES = 64
+    INTERVAL_SECONDS = 300
+    STEP_PAUSE_SECONDS = 0.05
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self.reclaimed_bytes = 0
+        self._thread = threading.Thread(target=self._run, name="StorageCompactor", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Run a compaction pass as soon as possible"""
+        self._wake.set()
+
+    def stop(self):
+        """Stop the compaction thread"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.INTERVAL_SECONDS)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"StorageCompactor: Compaction pass failed: {e}")
+
+    def compact(self) -> int:
+        """Reclaim free pages until none are left or writes are waiting, returning the bytes reclaimed"""
+        if not self._storage.is_incremental_vacuum():
+            logging.debug("StorageCompactor: Incremental auto-vacuum is off, run --compact-database to enable it")
+            return 0
+
+        reclaimed = 0
+        while not self._stopped.is_set():
+            if self._storage.get_free_pages() < self.MIN_FREE_PAGES:
+                break
+            if not self._storage.is_write_idle():
+                logging.debug("StorageCompactor: Writes pending, pausing compaction")
+                break
+            step = self._storage.compact_step(self.STEP_PAGES)
+            if step <= 0:
+                break
+            reclaimed += step
+            time.sleep(self.STEP_PAUSE_SECONDS)
+
+        if reclaimed:
+            self.reclaimed_bytes += reclaimed
+            logging.info(
+                f"StorageCompactor: Reclaimed {reclaimed / (1024 * 1024):.1f} MiB ({self.reclaimed_bytes / (1024 * 1024):.1f} MiB total)"
+            )
+        return reclaimed
@@ -0,0 +1,660 @@
+import sqlite3
+import logging
+from typing import Callable, List, Tuple
+from utils.message_parser import parse_date_epoch
+from utils.body_compression import compress_body
+from utils.thread_index import assign_thread_ids, thread_refresh_sql, refresh_queued_threads
+from utils.address_index import extract_message_addresses, index_message_addresses
+from utils.search_index import index_messages
+
+MESSAGE_COLUMNS = [
+    "uid",
+    "folder",
+    "account_id",
+    "message_id",
+    "subject",
+    "sender_name",
+    "sender_email",
+    "recipients",
+    "cc",
+    "bcc",
+    "reply_to",
+    "date_sent",
+    "date_received",
+    "flags",
+    "is_read",
+    "is_flagged",
+    "is_deleted",
+    "is_draft",
+    "is_answered",
+    "has_attachments",
+    "body_text",
+    "body_html",
+    "headers",
+    "envelope",
+    "bodystructure",
+    "thread_subject",
+    "thread_references",
+    "in_reply_to",
+    "message_references",
+    "sync_status",
+    "last_sync",
+]
+
+def get_table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Get the column names of a table"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def create_base_tables(conn: sqlite3.Connection):
+    """Create the attachment and sync state tables that predate schema versioning"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_uid INTEGER NOT NULL,
+            folder TEXT NOT NULL,
+            account_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            content_type TEXT,
+            size INTEGER,
+            part_id TEXT,
+            is_inline BOOLEAN DEFAULT 0,
+            content_id TEXT,
+            downloaded BOOLEAN DEFAULT 0,
+            file_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            last_sync TIMESTAMP,
+            last_uid INTEGER,
+            total_messages INTEGER DEFAULT 0,
+            sync_errors INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'idle',
+            UNIQUE(account_id, folder)
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attachments_message ON attachments(message_uid)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attachments_message_key ON attachments(account_id, folder, message_uid)"
+    )
+
+def migrate_composite_message_key(conn: sqlite3.Connection):
+    """Key messages by (account_id, folder, uid) behind a rowid surrogate, creating them on a new database"""
+    legacy_attachments = bool(conn.execute("PRAGMA foreign_key_list(attachments)").fetchall())
+    if legacy_attachments:
+        conn.execute("ALTER TABLE attachments RENAME TO attachments_legacy")
+        conn.execute("DROP INDEX IF EXISTS idx_attachments_message")
+        conn.execute("DROP INDEX IF EXISTS idx_attachments_message_key")
+    create_base_tables(conn)
+    if legacy_attachments:
+        column_list = ", ".join(get_table_columns(conn, "attachments_legacy"))
+        conn.execute(f"INSERT INTO attachments ({column_list}) SELECT {column_list} FROM attachments_legacy")
+        conn.execute("DROP TABLE attachments_legacy")
+    legacy_columns = get_table_columns(conn, "messages")
+    has_date_epoch = "date_epoch" in legacy_columns
+
+    conn.execute(
+        """
+        CREATE TABLE messages_v1 (
+            id INTEGER PRIMARY KEY,
+            uid INTEGER NOT NULL,
+            folder TEXT NOT NULL,
+            account_id TEXT NOT NULL,
+            message_id TEXT,
+            subject TEXT,
+            sender_name TEXT,
+            sender_email TEXT,
+            recipients TEXT, -- JSON array
+            cc TEXT, -- JSON array
+            bcc TEXT, -- JSON array
+            reply_to TEXT, -- JSON array
+            date_sent TIMESTAMP,
+            date_epoch INTEGER NOT NULL DEFAULT 0,
+            date_received TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            flags TEXT, -- JSON array
+            is_read BOOLEAN DEFAULT 0,
+            is_flagged BOOLEAN DEFAULT 0,
+            is_deleted BOOLEAN DEFAULT 0,
+            is_draft BOOLEAN DEFAULT 0,
+            is_answered BOOLEAN DEFAULT 0,
+            has_attachments BOOLEAN DEFAULT 0,
+            body_text TEXT,
+            body_html TEXT,
+            headers TEXT, -- JSON object
+            envelope TEXT, -- JSON object
+            bodystructure TEXT, -- JSON object
+            thread_subject TEXT,
+            thread_references TEXT, -- JSON array
+            in_reply_to TEXT,
+            message_references TEXT,
+            sync_status TEXT DEFAULT 'pending',
+            last_sync TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(account_id, folder, uid)
+        )
+    """
+    )
+
+    if legacy_columns:
+        columns = MESSAGE_COLUMNS + (["date_epoch"] if has_date_epoch else [])
+        column_list = ", ".join(columns)
+        conn.execute(
+            f"INSERT OR IGNORE INTO messages_v1 ({column_list}) SELECT {column_list} FROM messages"
+        )
+        conn.execute("DROP TABLE messages")
+    conn.execute("ALTER TABLE messages_v1 RENAME TO messages")
+
+    if legacy_columns and not has_date_epoch:
+        rows = conn.execute("SELECT id, date_sent FROM messages").fetchall()
+        conn.executemany(
+            "UPDATE messages SET date_epoch = ? WHERE id = ?",
+            [(parse_date_epoch(date_sent), row_id) for row_id, date_sent in rows],
+        )
+
+    conn.execute(
+        "CREATE INDEX idx_messages_folder_date ON messages(account_id, folder, is_deleted, date_epoch, uid)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_messages_thread ON messages(account_id, folder, thread_subject)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_messages_unread ON messages(account_id, folder, is_read)"
+    )
+
+def migrate_full_text_search(conn: sqlite3.Connection):
+    """Index subject, sender and body text in an FTS5 table kept in sync by triggers"""
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            subject, sender, body,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """
+    )
+    conn.execute(
+        """
+        INSERT INTO messages_fts (rowid, subject, sender, body)
+        SELECT id, subject, COALESCE(sender_name, '') || ' ' || COALESCE(sender_email, ''), body_text
+        FROM messages
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, subject, sender, body)
+            VALUES (new.id, new.subject, COALESCE(new.sender_name, '') || ' ' || COALESCE(new.sender_email, ''), new.body_text);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            DELETE FROM messages_fts WHERE rowid = old.id;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF subject, sender_name, sender_email, body_text ON messages
+        WHEN old.subject IS NOT new.subject
+            OR old.sender_name IS NOT new.sender_name
+            OR old.sender_email IS NOT new.sender_email
+            OR old.body_text IS NOT new.body_text
+        BEGIN
+            UPDATE messages_fts
+            SET subject = new.subject,
+                sender = COALESCE(new.sender_name, '') || ' ' || COALESCE(new.sender_email, ''),
+                body = new.body_text
+            WHERE rowid = new.id;
+        END
+    """
+    )
+
+def migrate_body_store(conn: sqlite3.Connection):
+    """Move message bodies out of the messages table into a compressed side table"""
+    conn.execute(
+        """
+        CREATE TABLE message_bodies (
+            id INTEGER PRIMARY KEY,
+            body_text BLOB,
+            body_html BLOB
+        )
+    """
+    )
+    rows = conn.execute(
+        """
+        SELECT id, body_text, body_html FROM messages
+        WHERE COALESCE(body_text, '') != '' OR COALESCE(body_html, '') != ''
+    """
+    ).fetchall()
+    conn.executemany(
+        "INSERT INTO message_bodies (id, body_text, body_html) VALUES (?, ?, ?)",
+        [
+            (row_id, compress_body(body_text), compress_body(body_html))
+            for row_id, body_text, body_html in rows
+        ],
+    )
+
+    conn.execute("DROP TRIGGER messages_fts_insert")
+    conn.execute("DROP TRIGGER messages_fts_update")
+    conn.execute("ALTER TABLE messages DROP COLUMN body_text")
+    conn.execute("ALTER TABLE messages DROP COLUMN body_html")
+
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, subject, sender)
+            VALUES (new.id, new.subject, COALESCE(new.sender_name, '') || ' ' || COALESCE(new.sender_email, ''));
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF subject, sender_name, sender_email ON messages
+        WHEN old.subject IS NOT new.subject
+            OR old.sender_name IS NOT new.sender_name
+            OR old.sender_email IS NOT new.sender_email
+        BEGIN
+            UPDATE messages_fts
+            SET subject = new.subject,
+                sender = COALESCE(new.sender_name, '') || ' ' || COALESCE(new.sender_email, '')
+            WHERE rowid = new.id;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER message_bodies_delete AFTER DELETE ON messages BEGIN
+            DELETE FROM message_bodies WHERE id = old.id;
+        END
+    """
+    )
+
+def migrate_raw_digest(conn: sqlite3.Connection):
+    """Reference cached raw messages from their message rows"""
+    conn.execute("ALTER TABLE messages ADD COLUMN raw_digest TEXT")
+
+def migrate_materialized_threads(conn: sqlite3.Connection):
+    """Maintain thread rows and a thread_id on every message"""
+    conn.execute("DROP TABLE IF EXISTS threads")
+    conn.execute(
+        """
+        CREATE TABLE threads (
+            id INTEGER PRIMARY KEY,
+            account_id TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            subject_key TEXT,
+            subject TEXT NOT NULL,
+            message_count INTEGER DEFAULT 0,
+            unread_count INTEGER DEFAULT 0,
+            has_attachments BOOLEAN DEFAULT 0,
+            is_flagged BOOLEAN DEFAULT 0,
+            participants TEXT, -- JSON object
+            latest_date TIMESTAMP,
+            latest_epoch INTEGER NOT NULL DEFAULT 0,
+            earliest_epoch INTEGER NOT NULL DEFAULT 0,
+            latest_message_uid INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(account_id, folder, subject_key)
+        )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX idx_threads_latest ON threads(account_id, folder, latest_epoch)"
+    )
+
+    conn.execute("ALTER TABLE messages ADD COLUMN thread_id INTEGER")
+    conn.execute(
+        "CREATE INDEX idx_messages_thread_id ON messages(thread_id, is_deleted, date_epoch, uid)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_messages_message_id ON messages(account_id, folder, message_id)"
+    )
+
+    conn.execute(
+        f"""
+        CREATE TRIGGER threads_refresh_on_update
+        AFTER UPDATE OF thread_id, is_read, is_flagged, is_deleted, has_attachments, date_epoch, sender_name, sender_email
+        ON messages
+        WHEN old.thread_id IS NOT new.thread_id
+            OR old.is_read IS NOT new.is_read
+            OR old.is_flagged IS NOT new.is_flagged
+            OR old.is_deleted IS NOT new.is_deleted
+            OR old.has_attachments IS NOT new.has_attachments
+            OR old.date_epoch IS NOT new.date_epoch
+            OR old.sender_name IS NOT new.sender_name
+            OR old.sender_email IS NOT new.sender_email
+        BEGIN
+            {thread_refresh_sql("new.thread_id")};
+            {thread_refresh_sql("old.thread_id")} AND old.thread_id IS NOT new.thread_id;
+            DELETE FROM threads WHERE id = old.thread_id AND message_count = 0;
+        END
+    """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER threads_refresh_on_delete AFTER DELETE ON messages
+        WHEN old.thread_id IS NOT NULL
+        BEGIN
+            {thread_refresh_sql("old.thread_id")};
+            DELETE FROM threads WHERE id = old.thread_id AND message_count = 0;
+        END
+    """
+    )
+
+def migrate_queued_thread_refresh(conn: sqlite3.Connection):
+    """Queue touched threads from the message triggers and refresh them once per commit"""
+    conn.execute("CREATE TABLE thread_refresh_queue (id INTEGER PRIMARY KEY)")
+    conn.execute("DROP TRIGGER threads_refresh_on_update")
+    conn.execute("DROP TRIGGER threads_refresh_on_delete")
+    conn.execute(
+        """
+        CREATE TRIGGER threads_queue_on_update
+        AFTER UPDATE OF thread_id, is_read, is_flagged, is_deleted, has_attachments, date_epoch, sender_name, sender_email
+        ON messages
+        WHEN old.thread_id IS NOT new.thread_id
+            OR old.is_read IS NOT new.is_read
+            OR old.is_flagged IS NOT new.is_flagged
+            OR old.is_deleted IS NOT new.is_deleted
+            OR old.has_attachments IS NOT new.has_attachments
+            OR old.date_epoch IS NOT new.date_epoch
+            OR old.sender_name IS NOT new.sender_name
+            OR old.sender_email IS NOT new.sender_email
+        BEGIN
+            INSERT INTO thread_refresh_queue (id)
+            SELECT new.thread_id WHERE new.thread_id IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM thread_refresh_queue WHERE id = new.thread_id);
+            INSERT INTO thread_refresh_queue (id)
+            SELECT old.thread_id WHERE old.thread_id IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM thread_refresh_queue WHERE id = old.thread_id);
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER threads_queue_on_delete AFTER DELETE ON messages
+        WHEN old.thread_id IS NOT NULL
+        BEGIN
+            INSERT INTO thread_refresh_queue (id)
+            SELECT old.thread_id
+            WHERE NOT EXISTS (SELECT 1 FROM thread_refresh_queue WHERE id = old.thread_id);
+        END
+    """
+    )
+    refresh_queued_threads(conn)
+
+def migrate_folder_stats(conn: sqlite3.Connection):
+    """Keep per-folder total and unread counters current through triggers"""
+    conn.execute(
+        """
+        CREATE TABLE folder_stats (
+            account_id TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            total_count INTEGER NOT NULL DEFAULT 0,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, folder)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute(
+        """
+        INSERT INTO folder_stats (account_id, folder, total_count, unread_count)
+        SELECT account_id, folder, SUM(is_deleted = 0), SUM(is_deleted = 0 AND is_read = 0)
+        FROM messages
+        GROUP BY account_id, folder
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER folder_stats_on_insert AFTER INSERT ON messages
+        WHEN new.is_deleted = 0
+        BEGIN
+            INSERT INTO folder_stats (account_id, folder)
+            SELECT new.account_id, new.folder
+            WHERE NOT EXISTS (
+                SELECT 1 FROM folder_stats WHERE account_id = new.account_id AND folder = new.folder
+            );
+            UPDATE folder_stats
+            SET total_count = total_count + 1, unread_count = unread_count + (new.is_read = 0)
+            WHERE account_id = new.account_id AND folder = new.folder;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER folder_stats_on_delete AFTER DELETE ON messages
+        WHEN old.is_deleted = 0
+        BEGIN
+            UPDATE folder_stats
+            SET total_count = total_count - 1, unread_count = unread_count - (old.is_read = 0)
+            WHERE account_id = old.account_id AND folder = old.folder;
+        END
+    """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER folder_stats_on_update AFTER UPDATE OF is_read, is_deleted, folder, account_id ON messages
+        WHEN old.is_read IS NOT new.is_read
+            OR old.is_deleted IS NOT new.is_deleted
+            OR old.folder IS NOT new.folder
+            OR old.account_id IS NOT new.account_id
+        BEGIN
+            UPDATE folder_stats
+            SET total_count = total_count - (old.is_deleted = 0),
+                unread_count = unread_count - (old.is_deleted = 0 AND old.is_read = 0)
+            WHERE account_id = old.account_id AND folder = old.folder;
+            INSERT INTO folder_stats (account_id, folder)
+            SELECT new.account_id, new.folder
+            WHERE NOT EXISTS (
+                SELECT 1 FROM folder_stats WHERE account_id = new.account_id AND folder = new.folder
+            );
+            UPDATE folder_stats
+            SET total_count = total_count + (new.is_deleted = 0),
+                unread_count = unread_count + (new.is_deleted = 0 AND new.is_read = 0)
+            WHERE account_id = new.account_id AND folder = new.folder;
+        END
+    """
+    )
+
+def migrate_address_index(conn: sqlite3.Connection):
+    """Normalize message addresses into indexed addresses and message_addresses tables"""
+    conn.execute(
+        """
+        CREATE TABLE addresses (
+            id INTEGER PRIMARY KEY,
+            email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            name TEXT COLLATE NOCASE
+        )
+    """
+    )
+    conn.execute("CREATE INDEX idx_addresses_name ON addresses(name)")
+    conn.execute(
+        """
+        CREATE TABLE message_addresses (
+            message_id INTEGER NOT NULL,
+            address_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            PRIMARY KEY (message_id, role, address_id)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute(
+        "CREATE INDEX idx_message_addresses_address ON message_addresses(address_id, message_id)"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER message_addresses_delete AFTER DELETE ON messages
+        BEGIN
+            DELETE FROM message_addresses WHERE message_id = old.id;
+        END
+    """
+    )
+
+    batches = {}
+    for row in conn.execute(
+        "SELECT uid, folder, account_id, sender_name, sender_email, recipients, cc, bcc, reply_to FROM messages"
+    ):
+        message = {
+            "sender": {"name": row[3], "email": row[4]},
+            "recipients": row[5],
+            "cc": row[6],
+            "bcc": row[7],
+            "reply_to": row[8],
+        }
+        batches.setdefault((row[2], row[1]), {})[row[0]] = extract_message_addresses(message)
+
+    for (account_id, folder), entries in batches.items():
+        index_message_addresses(conn, account_id, folder, entries)
+
+def migrate_sync_state(conn: sqlite3.Connection):
+    """Track UIDVALIDITY and UIDNEXT per folder for incremental sync"""
+    conn.execute("ALTER TABLE sync_status ADD COLUMN uid_validity INTEGER")
+    conn.execute("ALTER TABLE sync_status ADD COLUMN uid_next INTEGER")
+
+def migrate_highest_modseq(conn: sqlite3.Connection):
+    """Track the CONDSTORE HIGHESTMODSEQ per folder for flag delta sync"""
+    conn.execute("ALTER TABLE sync_status ADD COLUMN highest_modseq INTEGER")
+
+def migrate_attachment_key(conn: sqlite3.Connection):
+    """Key attachments by message and filename so re-stored messages keep their download state"""
+    conn.execute(
+        """
+        DELETE FROM attachments WHERE id != (
+            SELECT kept.id FROM attachments AS kept
+            WHERE kept.account_id = attachments.account_id
+            AND kept.folder = attachments.folder
+            AND kept.message_uid = attachments.message_uid
+            AND kept.filename = attachments.filename
+            ORDER BY kept.downloaded DESC, kept.id DESC
+            LIMIT 1
+        )
+    """
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX idx_attachments_message_filename ON attachments(account_id, folder, message_uid, filename)"
+    )
+
+def migrate_contentless_search_index(conn: sqlite3.Connection):
+    """Rebuild the search index contentless so it stops keeping an uncompressed copy of every body"""
+    conn.execute("DROP TRIGGER IF EXISTS messages_fts_insert")
+    conn.execute("DROP TRIGGER IF EXISTS messages_fts_update")
+    conn.execute("DROP TRIGGER IF EXISTS messages_fts_delete")
+    conn.execute("DROP TABLE messages_fts")
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            subject, sender, body,
+            content = '',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """
+    )
+    ids = [row[0] for row in conn.execute("SELECT id FROM messages")]
+    for start in range(0, len(ids), 500):
+        index_messages(conn, ids[start : start + 500])
+
+def migrate_thread_references(conn: sqlite3.Connection):
+    """Index the Message-IDs each message refers to and rethread every message through them"""
+    conn.execute(
+        """
+        CREATE TABLE message_refs (
+            ref TEXT NOT NULL,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (ref, message_id)
+        ) WITHOUT ROWID
+    """
+    )
+    conn.execute("CREATE INDEX idx_message_refs_message ON message_refs(message_id)")
+    conn.execute(
+        """
+        CREATE TRIGGER message_refs_delete AFTER DELETE ON messages
+        BEGIN
+            DELETE FROM message_refs WHERE message_id = old.id;
+        END
+    """
+    )
+
+    conn.execute("UPDATE messages SET thread_id = NULL WHERE thread_id IS NOT NULL")
+    folders = conn.execute("SELECT DISTINCT account_id, folder FROM messages").fetchall()
+    for account_id, folder in folders:
+        uids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT uid FROM messages WHERE account_id = ? AND folder = ?",
+                (account_id, folder),
+            )
+        ]
+        assign_thread_ids(conn, account_id, folder, uids)
+    conn.execute(
+        """
+        INSERT INTO thread_refresh_queue (id)
+        SELECT id FROM threads WHERE id NOT IN (SELECT id FROM thread_refresh_queue)
+    """
+    )
+    refresh_queued_threads(conn)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "composite message key", migrate_composite_message_key),
+    (2, "full text search", migrate_full_text_search),
+    (3, "compressed body store", migrate_body_store),
+    (4, "raw message digest", migrate_raw_digest),
+    (5, "materialized threads", migrate_materialized_threads),
+    (6, "queued thread refresh", migrate_queued_thread_refresh),
+    (7, "folder stats", migrate_folder_stats),
+    (8, "address index", migrate_address_index),
+    (9, "incremental sync state", migrate_sync_state),
+    (10, "highest modseq", migrate_highest_modseq),
+    (11, "attachment key", migrate_attachment_key),
+    (12, "contentless search index", migrate_contentless_search_index),
+    (13, "thread references", migrate_thread_references),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the latest applied schema version"""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations(conn: sqlite3.Connection):
+    """Apply pending schema migrations, each in its own transaction"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+
+    current_version = get_schema_version(conn)
+    for version, name, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        logging.info(f"StorageMigrations: Applying migration {version} ({name})")
+        conn.execute("BEGIN")
+        try:
+            migration(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name),
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"StorageMigrations: Migration {version} ({name}) failed: {e}")
+            raise
+
+    logging.debug(f"StorageMigrations: Schema is at version {get_schema_version(conn)}")
@@ -0,0 +1,142 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+WriteJob = Callable[[sqlite3.Connection], Any]
+
+class StorageWriter:
+    """Single thread owning the write connection, group-committing queued write jobs"""
+
+    MAX_BATCH = 64
+    _STOP = object()
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        before_commit: Optional[WriteJob] = None,
+    ):
+        self._connect = connect
+        self._before_commit = before_commit
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="StorageWriter", daemon=True)
+        self._conn = None
+        self._thread.start()
+
+    def submit(self, job: WriteJob, transaction: bool = True) -> Future:
+        """Queue a write job and get a future resolved once its batch is committed, or once it ran alone outside a transaction"""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(job(self._conn))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if not self._thread.is_alive():
+            future.set_exception(RuntimeError("StorageWriter is not running"))
+            return future
+
+        self._queue.put((job, future, transaction))
+        return future
+
+    def execute(self, job: WriteJob) -> Any:
+        """Run a write job and wait for its result"""
+        return self.submit(job).result()
+
+    def is_idle(self) -> bool:
+        """Check whether no write jobs are waiting"""
+        return self._queue.empty()
+
+    def stop(self):
+        """Commit all queued jobs and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        self._conn = self._connect()
+        logging.debug("StorageWriter: Started")
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._STOP in batch:
+                running = False
+                batch = [item for item in batch if item is not self._STOP]
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not self._STOP:
+                        batch.append(item)
+
+            self._run_batch(batch)
+
+        self._conn.close()
+        logging.debug("StorageWriter: Stopped")
+
+    def _run_batch(self, batch: List[Tuple[WriteJob, Future, bool]]):
+        pending = []
+        for job, future, transaction in batch:
+            if transaction:
+                pending.append((job, future))
+                continue
+            if pending:
+                self._commit_batch(pending)
+                pending = []
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(job(self._conn))
+                except Exception as e:
+                    logging.error(f"StorageWriter: Job outside a transaction failed: {e}")
+                    future.set_exception(e)
+        if pending:
+            self._commit_batch(pending)
+
+    def _commit_batch(self, batch: List[Tuple[WriteJob, Future]]):
+        started = time.perf_counter()
+        conn = self._conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    result = job(conn)
+                    conn.execute("RELEASE SAVEPOINT write_job")
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO SAVEPOINT write_job")
+                    conn.execute("RELEASE SAVEPOINT write_job")
+                    outcomes.append((future, None, e))
+            if self._before_commit:
+                self._before_commit(conn)
+            conn.commit()
+        except Exception as e:
+            logging.error(f"StorageWriter: Group commit of {len(batch)} jobs failed: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        logging.debug(
+            f"StorageWriter: Committed {len(batch)} jobs in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
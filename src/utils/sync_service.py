@@ -1,15 +1,19 @@
 import threading
 import time
 import logging
-from typing import Dict, List, Optional, Callable
-from utils.mail import fetch_messages_from_folder, fetch_imap_folders
+from typing import Dict, List, Optional, Callable, Set, Tuple
+from utils.mail import sync_folder_from_imap, fetch_imap_folders
+from utils.imap_idle import IMAPIdleListener
 
 class SyncService:
     """Background service for automatic message synchronization"""
 
-    def __init__(self, storage, sync_interval: int = 300):  
+    FLAG_REFRESH_SECONDS = 30 * 60
+
+    def __init__(self, storage, sync_interval: int = 300, watch_current_folder: bool = True):  
         self.storage = storage
         self.sync_interval = sync_interval
+        self.watch_current_folder = watch_current_folder
         self.running = False
         self.sync_thread = None
         self.sync_callbacks: List[Callable] = []
@@ -17,6 +21,12 @@ class SyncService:
         self.all_folders: Dict[str, List[str]] = {}  
         self.current_folder: Optional[str] = None  
         self.folder_discovery_complete: Dict[str, bool] = {}  
+        self.idle_listeners: Dict[Tuple[str, str], IMAPIdleListener] = {}
+        self._sync_lock = threading.Lock()
+        self._syncing: Dict[Tuple[str, str], bool] = {}
+        self._queued_syncs: Dict[Tuple[str, str], bool] = {}
+        self._pushed_flag_changes: Set[Tuple[str, str]] = set()
+        self._flags_refreshed_at: Dict[Tuple[str, str], float] = {}
 
     def start(self):
         """Start the background sync service"""
@@ -31,6 +41,11 @@ class SyncService:
     def stop(self):
         """Stop the background sync service"""
         self.running = False
+        for listener in list(self.idle_listeners.values()):
+            listener.stop()
+        for listener in list(self.idle_listeners.values()):
+            listener.stop(wait=True)
+        self.idle_listeners.clear()
         if self.sync_thread:
             self.sync_thread.join(timeout=5)
         logging.info("SyncService: Background sync service stopped")
@@ -54,8 +69,14 @@ class SyncService:
         )
         discovery_thread.start()
 
+        self._start_listener(account_data, "INBOX")
+        if self.watch_current_folder and self.current_folder and self.current_folder != "INBOX":
+            self._start_listener(account_data, self.current_folder)
+
     def unregister_account(self, account_id: str):
         """Unregister an account from automatic sync"""
+        for key in [key for key in self.idle_listeners if key[0] == account_id]:
+            self.idle_listeners.pop(key).stop()
         if account_id in self.accounts_to_sync:
             del self.accounts_to_sync[account_id]
         if account_id in self.all_folders:
@@ -66,45 +87,201 @@ class SyncService:
 
     def set_current_folder(self, folder_name: str):
         """Set the currently opened folder for priority syncing"""
+        previous_folder = self.current_folder
         self.current_folder = folder_name
+        if self.watch_current_folder and previous_folder != folder_name:
+            for account_data in list(self.accounts_to_sync.values()):
+                account_id = account_data["email"]
+                if previous_folder and previous_folder != "INBOX":
+                    listener = self.idle_listeners.pop((account_id, previous_folder), None)
+                    if listener:
+                        listener.stop()
+                if folder_name and folder_name != "INBOX":
+                    self._start_listener(account_data, folder_name)
         logging.debug(f"SyncService: Current folder set to {folder_name}")
 
+    def _start_listener(self, account_data: Dict, folder_name: str):
+        """Start an IDLE listener on a folder unless one is already running"""
+        key = (account_data["email"], folder_name)
+        if key in self.idle_listeners:
+            return
+        listener = IMAPIdleListener(account_data, folder_name, self._on_folder_changed)
+        self.idle_listeners[key] = listener
+        listener.start()
+
+    def _on_folder_changed(self, account_id: str, folder_name: str, flags_changed: bool):
+        """Sync a folder after its IDLE listener reported a change, refetching flags when a FETCH was pushed"""
+        account_data = self.accounts_to_sync.get(account_id)
+        if account_data and self.running:
+            logging.debug(f"SyncService: Push update for {account_id} - {folder_name}, flags changed: {flags_changed}")
+            if flags_changed:
+                with self._sync_lock:
+                    self._pushed_flag_changes.add((account_id, folder_name))
+            self.sync_folder(account_data, folder_name)
+
+    def is_folder_pushed(self, account_id: str, folder_name: str) -> bool:
+        """Check whether an IDLE listener keeps a folder up to date"""
+        listener = self.idle_listeners.get((account_id, folder_name))
+        return listener is not None and listener.pushing
+
     def sync_folder(self, account_data: Dict, folder_name: str, force: bool = False):
-        """Manually trigger sync for a specific folder"""
+        """Trigger sync for a specific folder, queueing it behind a sync already running"""
         account_id = account_data["email"]
+        key = (account_id, folder_name)
+        with self._sync_lock:
+            if key in self._syncing:
+                self._queued_syncs[key] = self._queued_syncs.get(key, False) or force
+                logging.debug(
+                    f"SyncService: Sync of {account_id} - {folder_name} running, queued another"
+                )
+                return
+            self._syncing[key] = force
+            refresh_flags = (
+                key in self._pushed_flag_changes
+                or time.monotonic() - self._flags_refreshed_at.get(key, float("-inf")) >= self.FLAG_REFRESH_SECONDS
+            )
+            self._pushed_flag_changes.discard(key)
+            if refresh_flags or force:
+                self._flags_refreshed_at[key] = time.monotonic()
         logging.info(
-            f"SyncService: Manual sync requested for {account_id} - {folder_name}"
+            f"SyncService: Sync requested for {account_id} - {folder_name}"
         )
 
-        def on_sync_complete(error, messages):
+        def on_sync_complete(error, result):
+            try:
+                handle_sync_result(error, result)
+            finally:
+                with self._sync_lock:
+                    self._syncing.pop(key, None)
+                    queued = key in self._queued_syncs
+                    queued_force = self._queued_syncs.pop(key, False)
+                if queued:
+                    self.sync_folder(account_data, folder_name, force=queued_force)
+
+        def handle_sync_result(error, result):
             if error:
                 logging.error(
                     f"SyncService: Sync failed for {account_id} - {folder_name}: {error}"
                 )
+                self.storage.update_sync_status(account_id, folder_name, "error")
                 self._notify_callbacks("sync_error", account_id, folder_name, error)
-            else:
-                if messages:
-                    
-                    try:
-                        self._update_messages_in_db(account_id, folder_name, messages)
-                        logging.info(
-                            f"SyncService: Updated {len(messages)} messages for {account_id} - {folder_name}"
-                        )
-                        self._notify_callbacks(
-                            "sync_complete", account_id, folder_name, len(messages)
-                        )
-                    except Exception as e:
-                        logging.error(f"SyncService: Error updating messages: {e}")
-                        self._notify_callbacks(
-                            "sync_error", account_id, folder_name, str(e)
-                        )
-                else:
-                    logging.debug(
-                        f"SyncService: No messages found for {account_id} - {folder_name}"
+                return
+
+            try:
+                new_count = self._apply_sync_result(
+                    account_id, folder_name, sync_state, result
+                )
+                flag_changes = self._flag_changes(account_id, folder_name, result["flag_updates"])
+                self.storage.update_sync_status(
+                    account_id,
+                    folder_name,
+                    "idle",
+                    last_uid=result["last_uid"],
+                    uid_validity=result["uid_validity"],
+                    uid_next=result["uid_next"],
+                    total_messages=result["total_messages"],
+                    highest_modseq=result["highest_modseq"],
+                    flag_updates=flag_changes,
+                )
+                if flag_changes:
+                    logging.info(
+                        f"SyncService: Applied {len(flag_changes)} flag changes to {folder_name}"
                     )
-                    self._notify_callbacks("sync_complete", account_id, folder_name, 0)
+                self._notify_callbacks(
+                    "sync_complete", account_id, folder_name, new_count
+                )
+            except Exception as e:
+                logging.error(f"SyncService: Error updating messages: {e}")
+                self._notify_callbacks("sync_error", account_id, folder_name, str(e))
+
+        try:
+            sync_state = self.storage.get_sync_status(account_id, folder_name)
+            if sync_state:
+                sync_state["lowest_uid"] = self.storage.get_lowest_uid(folder_name, account_id)
+            sync_folder_from_imap(
+                account_data,
+                folder_name,
+                sync_state,
+                on_sync_complete,
+                force=force,
+                refresh_flags=refresh_flags,
+            )
+        except Exception:
+            with self._sync_lock:
+                self._syncing.pop(key, None)
+                self._queued_syncs.pop(key, None)
+            raise
 
-        fetch_messages_from_folder(account_data, folder_name, on_sync_complete)
+    def _flag_changes(
+        self, account_id: str, folder_name: str, flag_updates: Dict[int, List[str]]
+    ) -> Dict[int, Dict]:
+        """Diff the IMAP flags fetched per UID against the stored flags and the state columns derived from them"""
+        if not flag_updates:
+            return {}
+        stored = self.storage.get_message_flag_states(folder_name, account_id, flag_updates)
+        changes = {}
+        for uid, flags in flag_updates.items():
+            state = {
+                "flags": sorted(flags),
+                "is_read": "\\Seen" in flags,
+                "is_flagged": "\\Flagged" in flags,
+                "is_answered": "\\Answered" in flags,
+                "is_deleted": "\\Deleted" in flags,
+                "is_draft": "\\Draft" in flags,
+            }
+            if uid in stored and stored[uid] != state:
+                changes[uid] = state
+        return changes
+
+    def _apply_sync_result(
+        self, account_id: str, folder_name: str, sync_state: Optional[Dict], result: Dict
+    ) -> int:
+        """Apply a full, incremental or unchanged folder sync result to the database"""
+        mode = result["mode"]
+        messages = result["messages"]
+
+        if mode == "unchanged":
+            logging.debug(f"SyncService: {account_id} - {folder_name} is unchanged")
+            return 0
+
+        if mode == "full":
+            if sync_state and sync_state.get("uid_validity") not in (None, result["uid_validity"]):
+                logging.info(
+                    f"SyncService: UIDVALIDITY of {folder_name} changed, dropping cached messages"
+                )
+                stale_uids = self.storage.get_message_uids(folder_name, account_id)
+                if stale_uids:
+                    self._remove_messages_from_db(account_id, folder_name, stale_uids)
+            self._update_messages_in_db(account_id, folder_name, messages)
+            return len(messages)
+
+        present_uids = result["present_uids"]
+        vanished_ranges = result["vanished_ranges"]
+        if present_uids is not None or vanished_ranges:
+            existing_uids = self.storage.get_message_uids(folder_name, account_id)
+            if present_uids is not None:
+                uids_to_remove = existing_uids - present_uids
+            else:
+                uids_to_remove = {
+                    uid
+                    for uid in existing_uids
+                    if any(low <= uid <= high for low, high in vanished_ranges)
+                }
+            if uids_to_remove:
+                logging.info(
+                    f"SyncService: Removing {len(uids_to_remove)} expunged messages from {folder_name}"
+                )
+                self._remove_messages_from_db(account_id, folder_name, uids_to_remove)
+
+        if messages:
+            stats = self.storage.store_messages(messages, folder_name, account_id)
+            logging.debug(
+                f"SyncService: Ingested {len(messages)} new messages for {folder_name} in {stats['elapsed'] * 1000:.1f} ms"
+            )
+        logging.info(
+            f"SyncService: Incremental sync of {account_id} - {folder_name} added {len(messages)} messages"
+        )
+        return len(messages)
 
     def _discover_folders_background(self, account_data: Dict):
         """Discover all folders in background thread"""
@@ -140,8 +317,7 @@ class SyncService:
         """Update database: add new messages, keep existing, remove deleted ones"""
         try:
             
-            existing_messages = self.storage.get_messages(folder_name, account_id)
-            existing_uids = {msg["uid"] for msg in existing_messages}
+            existing_uids = self.storage.get_message_uids(folder_name, account_id)
 
             
             new_uids = {msg["uid"] for msg in new_messages}
@@ -158,7 +334,10 @@ class SyncService:
 
             
             if new_messages:
-                self.storage.store_messages(new_messages, folder_name, account_id)
+                stats = self.storage.store_messages(new_messages, folder_name, account_id)
+                logging.debug(
+                    f"SyncService: Ingested batch for {folder_name} in {stats['elapsed'] * 1000:.1f} ms"
+                )
 
             logging.info(
                 f"SyncService: DB update complete for {folder_name}: {len(new_messages)} messages, removed {len(uids_to_remove)}"
@@ -175,25 +354,7 @@ class SyncService:
     ):
         """Remove specific messages from database"""
         try:
-            with self.storage.get_connection() as conn:
-                for uid in uids_to_remove:
-                    conn.execute(
-                        """
-                        DELETE FROM messages 
-                        WHERE uid = ? AND folder = ? AND account_id = ?
-                    """,
-                        (uid, folder_name, account_id),
-                    )
-
-                    
-                    conn.execute(
-                        """
-                        DELETE FROM attachments 
-                        WHERE message_uid = ? AND folder = ? AND account_id = ?
-                    """,
-                        (uid, folder_name, account_id),
-                    )
-
+            self.storage.delete_messages(uids_to_remove, folder_name, account_id)
         except Exception as e:
             logging.error(f"SyncService: Error removing messages from DB: {e}")
             raise
@@ -222,6 +383,9 @@ class SyncService:
                             break
 
                         
+                        if self.is_folder_pushed(account_id, folder_name):
+                            continue
+
                         if (
                             account_id in self.all_folders
                             and folder_name in self.all_folders[account_id]
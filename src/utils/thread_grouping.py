@@ -26,6 +26,20 @@ def group_messages_into_threads(
 
     return threads
 
+def build_threads_from_records(
+    thread_records: List[Dict[str, Any]], messages: List[Union[Message, Dict[str, Any]]]
+) -> List[MessageThread]:
+    """Attach loaded messages to their materialized thread rows, keeping the rows' order"""
+    messages_by_thread = {}
+    for message in messages:
+        messages_by_thread.setdefault(get_message_attr(message, "thread_id"), []).append(message)
+
+    return [
+        MessageThread.from_record(record, messages_by_thread[record["id"]])
+        for record in thread_records
+        if record["id"] in messages_by_thread
+    ]
+
 def find_thread_for_message(
     message: Union[Message, Dict[str, Any]], threads: List[MessageThread]
 ) -> Optional[MessageThread]:
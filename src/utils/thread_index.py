@@ -0,0 +1,172 @@
+import json
+import re
+import sqlite3
+from typing import Iterable, List, Optional, Set
+from utils.thread_grouping import normalize_subject
+
+THREAD_REFRESH_SQL = """
+    UPDATE threads SET
+        message_count = stats.message_count,
+        unread_count = stats.unread_count,
+        has_attachments = stats.has_attachments,
+        is_flagged = stats.is_flagged,
+        latest_epoch = stats.latest_epoch,
+        earliest_epoch = stats.earliest_epoch,
+        latest_date = (
+            SELECT date_sent FROM messages
+            WHERE thread_id = threads.id AND is_deleted = 0
+            ORDER BY date_epoch DESC, uid DESC LIMIT 1
+        ),
+        latest_message_uid = (
+            SELECT uid FROM messages
+            WHERE thread_id = threads.id AND is_deleted = 0
+            ORDER BY date_epoch DESC, uid DESC LIMIT 1
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT
+            thread_id,
+            COUNT(*) AS message_count,
+            COALESCE(SUM(is_read = 0), 0) AS unread_count,
+            COALESCE(MAX(has_attachments), 0) AS has_attachments,
+            COALESCE(MAX(is_flagged), 0) AS is_flagged,
+            COALESCE(MAX(date_epoch), 0) AS latest_epoch,
+            COALESCE(MIN(date_epoch), 0) AS earliest_epoch
+        FROM messages
+        WHERE {thread_filter} AND is_deleted = 0
+        GROUP BY thread_id
+    ) AS stats
+    WHERE threads.id = stats.thread_id
+"""
+
+PARTICIPANTS_REFRESH_SQL = """
+    UPDATE threads SET participants = (
+        SELECT json_group_object(email, name) FROM (
+            SELECT DISTINCT addresses.email AS email,
+                COALESCE(NULLIF(addresses.name, ''), addresses.email) AS name
+            FROM messages
+            JOIN message_addresses ON message_addresses.message_id = messages.id
+            JOIN addresses ON addresses.id = message_addresses.address_id
+            WHERE messages.thread_id = threads.id AND messages.is_deleted = 0
+        )
+    )
+    WHERE id IN (SELECT id FROM thread_refresh_queue)
+"""
+
+UPSERT_THREAD_SQL = """
+    INSERT INTO threads (account_id, folder, subject_key, subject)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(account_id, folder, subject_key) DO UPDATE SET subject = threads.subject
+    RETURNING id
+"""
+
+def thread_refresh_sql(thread_id: str) -> str:
+    """Get the statement recomputing one thread's aggregates from its messages"""
+    return THREAD_REFRESH_SQL.format(thread_filter=f"thread_id = {thread_id}")
+
+def refresh_queued_threads(conn: sqlite3.Connection) -> int:
+    """Recompute aggregates of every thread queued by the message triggers in one pass"""
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM thread_refresh_queue)").fetchone()[0]:
+        return 0
+
+    conn.execute(
+        """
+        UPDATE threads SET message_count = 0, unread_count = 0
+        WHERE id IN (SELECT id FROM thread_refresh_queue)
+    """
+    )
+    conn.execute(
+        THREAD_REFRESH_SQL.format(thread_filter="thread_id IN (SELECT id FROM thread_refresh_queue)")
+    )
+    conn.execute(PARTICIPANTS_REFRESH_SQL)
+    conn.execute(
+        """
+        DELETE FROM threads
+        WHERE id IN (SELECT id FROM thread_refresh_queue)
+        AND NOT EXISTS (SELECT 1 FROM messages WHERE thread_id = threads.id)
+    """
+    )
+    return conn.execute("DELETE FROM thread_refresh_queue").rowcount
+
+def normalize_message_id(message_id: Optional[str]) -> str:
+    """Strip the angle brackets and whitespace around a Message-ID"""
+    return (message_id or "").strip().strip("<>").strip()
+
+def parse_message_refs(
+    message_references: Optional[str], in_reply_to: Optional[str], thread_references: Optional[str]
+) -> List[str]:
+    """Collect the normalized Message-IDs a message replies to from its References, In-Reply-To and parsed references"""
+    refs = re.findall(r"<([^>]+)>", f"{message_references or ''} {in_reply_to or ''}")
+    refs.extend(json.loads(thread_references or "[]"))
+    return list(dict.fromkeys(normalize_message_id(ref) for ref in refs if normalize_message_id(ref)))
+
+def find_thread_by_references(
+    conn: sqlite3.Connection, account_id: str, folder: str, refs: List[str]
+) -> Optional[int]:
+    """Find the thread of a message this message refers to by Message-ID"""
+    if not refs:
+        return None
+    row = conn.execute(
+        """
+        SELECT thread_id FROM messages
+        WHERE account_id = ? AND folder = ? AND thread_id IS NOT NULL
+        AND message_id IN (SELECT value FROM json_each(?))
+        LIMIT 1
+    """,
+        (account_id, folder, json.dumps(refs + [f"<{ref}>" for ref in refs])),
+    ).fetchone()
+    return row[0] if row else None
+
+def find_thread_by_replies(
+    conn: sqlite3.Connection, account_id: str, folder: str, message_id: str
+) -> Optional[int]:
+    """Find the thread of a message that refers to this one, for parents arriving after their replies"""
+    if not message_id:
+        return None
+    row = conn.execute(
+        """
+        SELECT messages.thread_id FROM message_refs
+        JOIN messages ON messages.id = message_refs.message_id
+        WHERE message_refs.ref = ? AND messages.account_id = ? AND messages.folder = ?
+        AND messages.thread_id IS NOT NULL
+        LIMIT 1
+    """,
+        (message_id, account_id, folder),
+    ).fetchone()
+    return row[0] if row else None
+
+def assign_thread_ids(
+    conn: sqlite3.Connection, account_id: str, folder: str, uids: Iterable[int]
+) -> Set[int]:
+    """Attach unthreaded messages to a thread found by references in either direction or by normalized subject"""
+    rows = conn.execute(
+        """
+        SELECT id, uid, message_id, subject, thread_subject, thread_references, message_references, in_reply_to
+        FROM messages
+        WHERE account_id = ? AND folder = ? AND thread_id IS NULL
+        AND uid IN (SELECT value FROM json_each(?))
+        ORDER BY date_epoch, uid
+    """,
+        (account_id, folder, json.dumps(list(uids))),
+    ).fetchall()
+
+    thread_ids = set()
+    for row_id, uid, message_id, subject, thread_subject, thread_references, message_references, in_reply_to in rows:
+        refs = parse_message_refs(message_references, in_reply_to, thread_references)
+        conn.executemany(
+            "INSERT OR IGNORE INTO message_refs (ref, message_id) VALUES (?, ?)",
+            [(ref, row_id) for ref in refs],
+        )
+        thread_id = find_thread_by_references(conn, account_id, folder, refs)
+        if thread_id is None:
+            thread_id = find_thread_by_replies(conn, account_id, folder, normalize_message_id(message_id))
+        if thread_id is None:
+            normalized = normalize_subject(subject or thread_subject or "")
+            subject_key = normalized.lower() or None
+            thread_id = conn.execute(
+                UPSERT_THREAD_SQL, (account_id, folder, subject_key, normalized)
+            ).fetchone()[0]
+
+        conn.execute("UPDATE messages SET thread_id = ? WHERE id = ?", (thread_id, row_id))
+        thread_ids.add(thread_id)
+    return thread_ids
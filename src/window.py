@@ -109,6 +109,7 @@ class MyWindow(Adw.ApplicationWindow):
 
         self.message_list = MessageList(self.storage, None)
         self.message_list.connect_message_selected(self.on_message_selected)
+        self.message_list.connect_folder_synced(self.refresh_folder_stats)
         self.message_list.set_header(self.message_list_header)
 
         
@@ -140,6 +141,7 @@ class MyWindow(Adw.ApplicationWindow):
         message_list_scroll.set_vexpand(True)
         message_list_scroll.set_hexpand(True)
         message_list_scroll.set_child(self.message_list.widget)
+        message_list_scroll.connect_edge_reached(self.on_message_list_edge_reached)
 
         self.message_list_wrapper.append(self.message_list_header.widget)
         self.message_list_wrapper.append(self.search_box.widget)
@@ -200,6 +202,7 @@ class MyWindow(Adw.ApplicationWindow):
 
             self.message_viewer.show_select_message_state()
             self.message_viewer.widget.set_visible(True)
+            self.refresh_folder_stats()
             return
 
         if not hasattr(row, "account_data"):
@@ -218,6 +221,21 @@ class MyWindow(Adw.ApplicationWindow):
 
         self.message_viewer.show_select_message_state()
         self.message_viewer.widget.set_visible(True)
+        self.refresh_folder_stats()
+
+    def refresh_folder_stats(self):
+        if not self.current_account:
+            return
+
+        account_email = self.current_account["email"]
+        folder_stats = self.storage.get_folder_stats(account_email)
+        self.sidebar.set_folder_stats(account_email, folder_stats)
+
+        inbox_unread = folder_stats.get("INBOX", {}).get("unread", 0)
+        if inbox_unread:
+            self.set_title(f"Brevlada Email Client ({inbox_unread})")
+        else:
+            self.set_title("Brevlada Email Client")
 
     def on_message_selected(self, message):
         if message:
@@ -227,6 +245,10 @@ class MyWindow(Adw.ApplicationWindow):
             self.message_viewer.show_select_message_state()
             self.message_viewer.widget.set_visible(True)
 
+    def on_message_list_edge_reached(self, scrolled_window, position):
+        if position == Gtk.PositionType.BOTTOM:
+            self.message_list.load_more_messages()
+
     def on_refresh_requested(self):
         if self.current_account and self.current_folder:
             logging.info(
@@ -237,4 +259,5 @@ class MyWindow(Adw.ApplicationWindow):
     def on_message_read_status_changed(self, message):
         logging.debug(f"Main: Message read status changed for UID {message.get('uid')}")
         
-        self.message_list.refresh_message_display() 
\ No newline at end of file
+        self.message_list.refresh_message_display()
+        self.refresh_folder_stats() 
\ No newline at end of file